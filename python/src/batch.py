@@ -0,0 +1,55 @@
+"""Batch mode for running recorded command files through the simulator."""
+
+from .command_parser import CommandException
+from .command_parser import CommandParser
+from .output_sink import OutputSink
+from .video_player import VideoPlayer
+import time
+
+
+def run_batch(lines, video_library=None, output=None, search_answer=None,
+              stats=None, page_size=20):
+    """Executes commands one per line until the lines run out or an EXIT
+    command is read.
+
+    Args:
+        lines: An iterable of command lines, such as an open file.
+        video_library: The library to play from. Defaults to a VideoLibrary
+            of the bundled catalog.
+        output: The OutputSink to write to. Defaults to a sink that leaves
+            flushing stdout to its own buffering.
+        search_answer: The answer given to every search prompt. If None,
+            the line following a search command is read as its answer.
+        stats: A CommandStats to record every command to.
+        page_size: How many search results are shown at a time. None shows
+            them all.
+
+    Returns:
+        The number of commands executed and the seconds they took.
+    """
+    lines = iter(lines)
+    if output is None:
+        output = OutputSink(autoflush=False)
+    if search_answer is None:
+        def answer():
+            return next(lines, "").rstrip("\n")
+    else:
+        def answer():
+            return search_answer
+    parser = CommandParser(VideoPlayer(video_library, output=output,
+                                       input_fn=answer, page_size=page_size),
+                           stats)
+
+    commands = 0
+    start = time.perf_counter()
+    for line in lines:
+        command = line.rstrip("\n")
+        if command.upper() == "EXIT":
+            break
+        commands += 1
+        try:
+            parser.execute_command(command.split())
+        except CommandException as e:
+            output.write_line(str(e))
+    output.flush()
+    return commands, time.perf_counter() - start
@@ -0,0 +1,295 @@
+"""Times every simulator command against synthetic catalogs of growing size."""
+
+from .columnar_library import ColumnarVideoLibrary, compile_catalog
+from .command_parser import CommandParser
+from .output_sink import OutputSink
+from .synthetic_catalog import SyntheticCatalog
+from .video_library import VideoLibrary
+from .video_player import VideoPlayer
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+BACKENDS = ("objects", "lazy", "columnar", "compiled")
+# The backends that cache search results.
+CACHING_BACKENDS = ("objects", "lazy")
+
+
+class _NullStream:
+    """A text stream that discards everything, so the benchmark measures
+    producing output rather than a terminal drawing it."""
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+def prepare_backend(backend, catalog_path):
+    """Returns the path open_backend() loads a catalog from, doing any work
+    that is done once ahead of serving rather than on every load.
+
+    Args:
+        backend: One of BACKENDS.
+        catalog_path: Path of the catalog. The compiled backend compiles it
+            next to the catalog and returns the compiled path.
+    """
+    if backend not in BACKENDS:
+        raise ValueError("unknown backend: {0}".format(backend))
+    if backend == "compiled":
+        compiled_path = str(catalog_path) + ".ytc"
+        compile_catalog(catalog_path, compiled_path)
+        return compiled_path
+    return catalog_path
+
+
+def open_backend(backend, path, search_cache_size=0):
+    """Returns a library of the given backend holding a catalog.
+
+    Args:
+        backend: One of BACKENDS.
+        path: The path prepare_backend() returned for the catalog.
+        search_cache_size: How many searches the library caches, for the
+            CACHING_BACKENDS. Defaults to none, so that search timings
+            measure the search itself.
+    """
+    if backend == "objects":
+        return VideoLibrary(path, search_cache_size=search_cache_size)
+    if backend == "lazy":
+        return VideoLibrary(path, lazy=True,
+                            search_cache_size=search_cache_size)
+    if backend == "columnar":
+        return ColumnarVideoLibrary(path)
+    if backend == "compiled":
+        return ColumnarVideoLibrary.open_compiled(path)
+    raise ValueError("unknown backend: {0}".format(backend))
+
+
+def _session(catalog, rng, iteration):
+    """Yields the (benchmark name, command) pairs of one pass over every
+    command. Commands are ordered so that each one finds the state it needs,
+    such as the playlist it adds to."""
+    video_id = SyntheticCatalog.video_id(rng.randrange(catalog.count))
+    other_id = SyntheticCatalog.video_id(rng.randrange(catalog.count))
+    playlist = "bench_{0}".format(iteration)
+    yield "NUMBER_OF_VIDEOS", "NUMBER_OF_VIDEOS"
+    yield "SHOW_ALL_VIDEOS", "SHOW_ALL_VIDEOS"
+    yield "PLAY", "PLAY " + video_id
+    yield "SHOW_PLAYING", "SHOW_PLAYING"
+    yield "PAUSE", "PAUSE"
+    yield "CONTINUE", "CONTINUE"
+    yield "PLAY_RANDOM", "PLAY_RANDOM"
+    yield "STOP", "STOP"
+    yield "SEARCH_VIDEOS common", "SEARCH_VIDEOS " + catalog.words[0]
+    yield "SEARCH_VIDEOS rare", "SEARCH_VIDEOS " + rng.choice(catalog.words[-1000:])
+    yield "SEARCH_VIDEOS missing", "SEARCH_VIDEOS zzzz"
+    yield "SEARCH_VIDEOS_RANKED common", "SEARCH_VIDEOS_RANKED " + catalog.words[0]
+    yield "SEARCH_VIDEOS_RANKED prefix OR", "SEARCH_VIDEOS_RANKED {0}* OR {1}".format(
+        catalog.words[1][:2], rng.choice(catalog.words[-1000:]))
+    yield "SEARCH_VIDEOS_WITH_TAG common", "SEARCH_VIDEOS_WITH_TAG " + catalog.tags[0]
+    yield "SEARCH_VIDEOS_WITH_TAG rare", "SEARCH_VIDEOS_WITH_TAG " + rng.choice(catalog.tags[-100:])
+    yield "CREATE_PLAYLIST", "CREATE_PLAYLIST " + playlist
+    yield "ADD_TO_PLAYLIST", "ADD_TO_PLAYLIST {0} {1}".format(playlist, video_id)
+    yield "ADD_TO_PLAYLIST", "ADD_TO_PLAYLIST {0} {1}".format(playlist, other_id)
+    yield "SHOW_PLAYLIST", "SHOW_PLAYLIST " + playlist
+    yield "SHOW_ALL_PLAYLISTS", "SHOW_ALL_PLAYLISTS"
+    yield "REMOVE_FROM_PLAYLIST", "REMOVE_FROM_PLAYLIST {0} {1}".format(playlist, video_id)
+    yield "CLEAR_PLAYLIST", "CLEAR_PLAYLIST " + playlist
+    yield "DELETE_PLAYLIST", "DELETE_PLAYLIST " + playlist
+    yield "FLAG_VIDEO", "FLAG_VIDEO {0} benchmark".format(video_id)
+    yield "ALLOW_VIDEO", "ALLOW_VIDEO " + video_id
+
+
+def _repeat_session(catalog):
+    """Yields the (benchmark name, command) pairs of one pass over searches
+    repeated unchanged, which a caching library answers from its cache after
+    the first pass."""
+    yield "SEARCH_VIDEOS repeat", "SEARCH_VIDEOS " + catalog.words[0]
+    yield "SEARCH_VIDEOS_WITH_TAG repeat", "SEARCH_VIDEOS_WITH_TAG " + catalog.tags[0]
+
+
+def _parser(library, seed):
+    player = VideoPlayer(library, rng=random.Random(seed),
+                         output=OutputSink(_NullStream(), autoflush=False),
+                         input_fn=lambda: "no")
+    return CommandParser(player)
+
+
+def _time(parser, commands, timings):
+    """Runs (benchmark name, command) pairs, adding the seconds each took
+    to timings."""
+    for name, command in commands:
+        args = command.split()
+        start = time.perf_counter()
+        parser.execute_command(args)
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+
+
+def _summarize(timings):
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "mean": sum(timings) / len(timings),
+        "p50": timings[len(timings) // 2],
+        "p99": timings[len(timings) * 99 // 100],
+        "max": timings[-1],
+    }
+
+
+def run_benchmark(catalog, catalog_path, backend="objects", iterations=20,
+                  seed=0):
+    """Loads a catalog and times every command against it.
+
+    Args:
+        catalog: The SyntheticCatalog written to catalog_path.
+        catalog_path: Path of the catalog file.
+        backend: The library backend to load the catalog with, one of
+            BACKENDS.
+        iterations: How many times each command is run.
+        seed: The seed picking the videos and search terms used.
+
+    Returns:
+        A dict with the number of videos, the seconds taken to load them and,
+        for each benchmark, the number of runs and the mean, p50, p99 and
+        maximum seconds per run. Loading excludes prepare_backend(), so for
+        the compiled backend it only times mapping the compiled catalog.
+
+        Every command is timed with search caching off. The "repeat"
+        benchmarks run the same searches each iteration against a library
+        that caches them, if the backend does, timing the cached path.
+    """
+    path = prepare_backend(backend, catalog_path)
+    start = time.perf_counter()
+    library = open_backend(backend, path)
+    load_seconds = time.perf_counter() - start
+    parser = _parser(library, seed)
+    rng = random.Random(seed)
+    timings = {}
+    for iteration in range(iterations):
+        _time(parser, _session(catalog, rng, iteration), timings)
+    if backend in CACHING_BACKENDS:
+        parser = _parser(open_backend(backend, path, search_cache_size=1024),
+                         seed)
+    for _ in range(iterations):
+        _time(parser, _repeat_session(catalog), timings)
+    return {
+        "videos": catalog.count,
+        "load_seconds": load_seconds,
+        "commands": {name: _summarize(runs) for name, runs in timings.items()},
+    }
+
+
+def run_benchmarks(sizes, backend="objects", iterations=20, seed=0,
+                   directory=None):
+    """Generates a catalog of each size and benchmarks it.
+
+    Args:
+        sizes: The catalog sizes, in videos.
+        backend: The library backend, one of BACKENDS.
+        iterations: How many times each command is run per catalog.
+        seed: The seed the catalogs and commands are generated from.
+        directory: Where to write the catalogs. Defaults to a temporary
+            directory removed afterwards.
+
+    Returns:
+        A dict describing the run, with a list of the run_benchmark() results
+        for each size.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        for size in sizes:
+            catalog = SyntheticCatalog(size, seed)
+            # Everything the catalog is generated from is in its name, so a
+            # catalog kept in directory is only reused by identical runs.
+            catalog_path = os.path.join(
+                directory or temporary_directory,
+                "synthetic_{0}_seed{1}_words{2}_tags{3}.txt".format(
+                    size, seed, len(catalog.words), len(catalog.tags)))
+            if not os.path.exists(catalog_path):
+                catalog.write(catalog_path)
+            results.append(run_benchmark(
+                catalog, catalog_path, backend, iterations, seed))
+    return {
+        "python": platform.python_version(),
+        "backend": backend,
+        "iterations": iterations,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def find_regressions(report, baseline, tolerance=1.5):
+    """Compares a run_benchmarks() report with an earlier one.
+
+    Args:
+        report: The report to check.
+        baseline: The report to compare against.
+        tolerance: How many times slower than the baseline a p50 may be
+            before it counts as a regression.
+
+    Returns:
+        A list of (videos, benchmark name, baseline p50, new p50) tuples, one
+        per regression.
+    """
+    baseline_results = {result["videos"]: result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = baseline_results.get(result["videos"])
+        if old is None:
+            continue
+        for name, stats in result["commands"].items():
+            old_stats = old["commands"].get(name)
+            if old_stats and stats["p50"] > old_stats["p50"] * tolerance:
+                regressions.append(
+                    (result["videos"], name, old_stats["p50"], stats["p50"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "sizes", type=int, nargs="*", default=[1000, 10000, 100000],
+        help="catalog sizes to benchmark (defaults to 1000 10000 100000)")
+    arg_parser.add_argument("--backend", choices=BACKENDS, default="objects")
+    arg_parser.add_argument("--iterations", type=int, default=20)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--catalogs", metavar="DIR",
+        help="keep generated catalogs in DIR and reuse them on later runs")
+    arg_parser.add_argument(
+        "--output", metavar="FILE", help="write the JSON report to FILE "
+                                         "instead of stdout")
+    arg_parser.add_argument(
+        "--baseline", metavar="FILE",
+        help="compare with an earlier JSON report and exit with status 1 if "
+             "any command got slower")
+    arg_parser.add_argument(
+        "--tolerance", type=float, default=1.5,
+        help="how many times slower than the baseline counts as a "
+             "regression (defaults to 1.5)")
+    args = arg_parser.parse_args()
+    if args.catalogs:
+        os.makedirs(args.catalogs, exist_ok=True)
+    report = run_benchmarks(args.sizes, args.backend, args.iterations,
+                            args.seed, args.catalogs)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = find_regressions(
+                report, json.load(baseline_file), args.tolerance)
+        for videos, name, old, new in regressions:
+            print("{0} videos, {1}: p50 {2:.6f}s -> {3:.6f}s".format(
+                videos, name, old, new), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
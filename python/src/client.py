@@ -0,0 +1,188 @@
+"""A client and load generator for the simulator server."""
+
+from .run import PROMPT
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+
+# The endings of a server response: the command prompt, or the search prompt
+# waiting for the user to pick a result.
+_COMMAND_PROMPT = PROMPT.encode("utf-8")
+_SEARCH_PROMPT = b"we will assume it's a no.\n"
+
+# The commands each load generator session cycles through.
+DEFAULT_LOAD_COMMANDS = (
+    "NUMBER_OF_VIDEOS",
+    "SHOW_ALL_VIDEOS",
+    "PLAY_RANDOM",
+    "SHOW_PLAYING",
+    "SEARCH_VIDEOS cat",
+    "SEARCH_VIDEOS_WITH_TAG #animal",
+    "CREATE_PLAYLIST load_test",
+    "ADD_TO_PLAYLIST load_test funny_dogs_video_id",
+    "SHOW_PLAYLIST load_test",
+    "DELETE_PLAYLIST load_test",
+    "STOP",
+)
+
+
+class Session:
+    """A class used to represent a client session with the server."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8888, path=None):
+        """Connects to a server. Returns the Session and the greeting.
+
+        Args:
+            host: The server address.
+            port: The server TCP port.
+            path: If given, connect to this Unix socket instead of TCP.
+        """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        session = cls(reader, writer)
+        greeting, _ = await session._read_response()
+        return session, greeting
+
+    async def _read_response(self):
+        """Reads up to the next prompt. Returns the text before the prompt and
+        whether the prompt is a search prompt waiting for an answer."""
+        data = b""
+        while True:
+            if data.endswith(_COMMAND_PROMPT):
+                return data[:-len(_COMMAND_PROMPT)].decode("utf-8"), False
+            if data.endswith(_SEARCH_PROMPT):
+                return data.decode("utf-8"), True
+            chunk = await self._reader.read(65536)
+            if not chunk:
+                return data.decode("utf-8"), False
+            data += chunk
+
+    async def send(self, line):
+        """Sends one line, a command or the answer to a search prompt.
+
+        Args:
+            line: The line to send.
+
+        Returns:
+            The server's response up to the next prompt, and whether that
+            prompt is a search prompt waiting for an answer.
+        """
+        self._writer.write(line.encode("utf-8") + b"\n")
+        return await self._read_response()
+
+    async def execute(self, command, search_answer="no"):
+        """Sends a command and returns the server's response to it.
+
+        Args:
+            command: The command line to send.
+            search_answer: The answer sent if the command ends in a search
+                prompt.
+        """
+        response, awaiting_answer = await self.send(command)
+        if awaiting_answer:
+            answer_response, _ = await self.send(search_answer)
+            response += answer_response
+        return response
+
+    async def close(self):
+        """Ends the session. Returns the server's farewell."""
+        farewell = await self.execute("EXIT")
+        self._writer.close()
+        await self._writer.wait_closed()
+        return farewell
+
+
+async def generate_load(host="127.0.0.1", port=8888, path=None, sessions=100,
+                        commands_per_session=100,
+                        commands=DEFAULT_LOAD_COMMANDS):
+    """Runs many concurrent sessions against a server.
+
+    Args:
+        host: The server address.
+        port: The server TCP port.
+        path: If given, connect to this Unix socket instead of TCP.
+        sessions: The number of concurrent sessions.
+        commands_per_session: How many commands each session sends.
+        commands: The commands each session cycles through.
+
+    Returns:
+        A dict with the number of commands sent, the seconds taken, the
+        commands per second and the p50 and p99 command latencies in seconds.
+    """
+    latencies = []
+
+    async def run_session():
+        session, _ = await Session.connect(host, port, path)
+        for command in itertools.islice(
+                itertools.cycle(commands), commands_per_session):
+            start = time.perf_counter()
+            await session.execute(command)
+            latencies.append(time.perf_counter() - start)
+        await session.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session() for _ in range(sessions)))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "commands": len(latencies),
+        "seconds": seconds,
+        "commands_per_second": len(latencies) / seconds if seconds else 0,
+        "p50_latency": latencies[len(latencies) // 2] if latencies else 0,
+        "p99_latency": latencies[len(latencies) * 99 // 100] if latencies else 0,
+    }
+
+
+async def _interact(host, port, path):
+    session, greeting = await Session.connect(host, port, path)
+    print(greeting, end="")
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            command = await loop.run_in_executor(None, input, PROMPT)
+        except EOFError:
+            command = "EXIT"
+        if command.upper() == "EXIT":
+            print(await session.close(), end="")
+            return
+        response, awaiting_answer = await session.send(command)
+        print(response, end="")
+        while awaiting_answer:
+            answer = await loop.run_in_executor(None, input)
+            response, awaiting_answer = await session.send(answer)
+            print(response, end="")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8888)
+    arg_parser.add_argument("--unix", metavar="PATH",
+                            help="connect to a Unix socket instead of TCP")
+    arg_parser.add_argument(
+        "--load", type=int, metavar="SESSIONS",
+        help="instead of an interactive session, run SESSIONS concurrent "
+             "sessions and report throughput")
+    arg_parser.add_argument(
+        "--commands", type=int, default=100,
+        help="commands sent by each load generator session")
+    args = arg_parser.parse_args()
+    if args.load:
+        results = asyncio.run(generate_load(
+            args.host, args.port, args.unix, args.load, args.commands))
+        for name, value in results.items():
+            print("{0}: {1}".format(name, value))
+    else:
+        try:
+            asyncio.run(_interact(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            sys.exit(1)
@@ -0,0 +1,712 @@
+"""A column oriented video library class."""
+
+from .flag_store import restore_flags
+from .title_index import TitleIndex
+from .video_library import DEFAULT_CATALOG_PATH, _read_records
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+import bisect
+import heapq
+import itertools
+import mmap
+import multiprocessing
+import random
+import struct
+import sys
+import threading
+
+# Row numbers and tag ids are stored as unsigned 32-bit integers. Byte offsets
+# into the string blobs use 64-bit integers.
+
+# Ends every title in the case insensitive search blob, so that a match can
+# never run from one title into the next.
+_SEPARATOR = b"\x00"
+
+# How many random rows get_random_video draws, hoping for an unflagged one,
+# before it falls back to collecting all unflagged rows.
+_RANDOM_ATTEMPTS = 32
+
+# A compiled catalog starts with a header of magic, byte order (1 for little
+# endian), the item sizes of the "I" and "q" arrays, video count and section
+# count, followed by an (offset, length) entry per section. Every section
+# starts at a multiple of eight bytes, so arrays can be mapped in place.
+_MAGIC = b"YTCATLG2"
+_HEADER = struct.Struct("<8sBBBQQ")
+_SECTION = struct.Struct("<QQ")
+# The sections of a compiled catalog in file order, with the typecode of the
+# array stored in each. Sections without a typecode hold utf-8 blobs.
+_SECTIONS = (
+    ("_titles", None),
+    ("_title_offsets", "q"),
+    ("_titles_nocase", None),
+    ("_title_nocase_offsets", "q"),
+    ("_ids", None),
+    ("_id_offsets", "q"),
+    ("_id_order", "I"),
+    ("_title_order", "I"),
+    ("_title_rank", "I"),
+    ("_tag_ids", "I"),
+    ("_tag_offsets", "q"),
+    ("tag_names", None),
+    ("tag_name_offsets", "q"),
+    ("tag_keys", None),
+    ("tag_key_offsets", "q"),
+    ("tag_postings", "I"),
+    ("tag_posting_offsets", "q"),
+)
+
+
+def _blob(strings):
+    """Packs strings into one utf-8 blob.
+
+    Args:
+        strings: An iterable of strings.
+
+    Returns:
+        The blob and an array of byte offsets, where string i is stored at
+        blob[offsets[i]:offsets[i + 1]].
+    """
+    parts = []
+    offsets = array("q", [0])
+    position = 0
+    for string in strings:
+        encoded = string.encode("utf-8")
+        parts.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+    return b"".join(parts), offsets
+
+
+def _unpack(blob, offsets):
+    """Returns the list of strings packed by _blob."""
+    return [str(blob[offsets[i]:offsets[i + 1]], "utf-8")
+            for i in range(len(offsets) - 1)]
+
+
+class _MappedBlob:
+    """A blob section of a memory-mapped compiled catalog. Supports the
+    find() used by title search, which memoryview lacks."""
+
+    def __init__(self, mapped, offset, length):
+        self._mapped = mapped
+        self._offset = offset
+        self._length = length
+
+    def find(self, sub, start=0):
+        position = self._mapped.find(
+            sub, self._offset + start, self._offset + self._length)
+        return -1 if position == -1 else position - self._offset
+
+    def __bytes__(self):
+        return self._mapped[self._offset:self._offset + self._length]
+
+
+class _SharedFlagReasons:
+    """The flag reasons of a ColumnarVideoLibrary kept in shared memory, so
+    that processes forked after they are created see each other's changes.
+
+    Each row has a slot of a fixed number of bytes holding its reason as
+    length prefixed utf-8, so the space a reason takes is reclaimed as soon
+    as its row is allowed or flagged again. Writers must hold the library's
+    flag lock.
+    """
+
+    # The length of the reason in a slot plus one, zero if it has none.
+    _LENGTH = struct.Struct("<H")
+
+    def __init__(self, count, slot_size):
+        if not self._LENGTH.size < slot_size <= self._LENGTH.size + 0xFFFE:
+            raise ValueError("slot_size must be between {0} and {1}".format(
+                self._LENGTH.size + 1, self._LENGTH.size + 0xFFFE))
+        self._slot_size = slot_size
+        self._slots = mmap.mmap(-1, slot_size * max(count, 1))
+
+    def __setitem__(self, row, reason):
+        data = reason.encode("utf-8")
+        if len(data) > self._slot_size - self._LENGTH.size:
+            raise ValueError("Reason is too long")
+        start = row * self._slot_size + self._LENGTH.size
+        self._slots[start:start + len(data)] = data
+        self._LENGTH.pack_into(self._slots, row * self._slot_size, len(data) + 1)
+
+    def get(self, row, default=None):
+        offset = row * self._slot_size
+        length = self._LENGTH.unpack_from(self._slots, offset)[0]
+        if not length:
+            return default
+        start = offset + self._LENGTH.size
+        return self._slots[start:start + length - 1].decode("utf-8")
+
+    def pop(self, row, default=None):
+        reason = self.get(row, default)
+        self._LENGTH.pack_into(self._slots, row * self._slot_size, 0)
+        return reason
+
+
+class _ColumnarVideo:
+    """A view over one row of a ColumnarVideoLibrary that behaves like a
+    Video. It only holds its row, and reads each field from the library's
+    columns when it is accessed."""
+
+    __slots__ = ("_library", "_row")
+
+    def __init__(self, library, row):
+        self._library = library
+        self._row = row
+
+    @property
+    def title(self) -> str:
+        return self._library._title(self._row)
+
+    @property
+    def video_id(self) -> str:
+        return self._library._video_id(self._row)
+
+    @property
+    def tags(self):
+        return self._library._tags(self._row)
+
+    def __eq__(self, other):
+        if isinstance(other, _ColumnarVideo):
+            return self._library is other._library and self._row == other._row
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._library), self._row))
+
+    @property
+    def flagged(self) -> bool:
+        return self._library._is_flagged(self._row)
+
+    @property
+    def flagged_reason(self) -> str:
+        return self._library._flag_reason(self._row)
+
+    def flag(self, reason):
+        """Flags video for given reason. Reason defaults to 'Not supplied' if left blank
+
+        Args:
+            reason: The reason for flagging the video"""
+        self._library._set_flag(self._row, reason or "Not supplied")
+
+    def unflag(self):
+        """Removes the flag from a video"""
+        self._library._clear_flag(self._row)
+
+
+class _ColumnarVideos(Sequence):
+    """A read-only sequence of the videos at some rows of a
+    ColumnarVideoLibrary, creating each view only when it is reached."""
+
+    def __init__(self, library, rows):
+        self._library = library
+        self._rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return _ColumnarVideos(self._library, self._rows[index])
+        return self._library._video(self._rows[index])
+
+    def __iter__(self):
+        return map(self._library._video, self._rows)
+
+
+class ColumnarVideoLibrary:
+    """A class used to represent a Video Library stored column by column.
+
+    Titles, ids and tags are packed into contiguous blobs and arrays instead
+    of one Video object per video, and Video views are only created for the
+    videos handed back to callers. Apart from flag state the catalog is
+    read-only, and flag changes are guarded by a lock so the library can be
+    shared by players on several threads.
+    """
+
+    def __init__(self, catalog_path=None, records=None):
+        """The ColumnarVideoLibrary class is initialized.
+
+        Args:
+            catalog_path: Path of the catalog to load. Defaults to the bundled
+                videos.txt.
+            records: An iterable of (title, video_id, tags) tuples to build
+                the library from instead of reading a catalog.
+        """
+        if records is not None:
+            self._build(records)
+        else:
+            catalog_path = Path(catalog_path or DEFAULT_CATALOG_PATH)
+            with open(catalog_path, encoding="utf-8") as video_file:
+                self._build(_read_records(video_file))
+
+    def _build(self, records):
+        """Packs catalog records into columns."""
+        rows = {}
+        titles = []
+        video_ids = []
+        tag_lists = []
+        for title, video_id, tags in records:
+            row = rows.setdefault(video_id, len(video_ids))
+            if row == len(video_ids):
+                titles.append(title)
+                video_ids.append(video_id)
+                tag_lists.append(tags)
+            else:
+                # A repeated id replaces the earlier record in place.
+                titles[row] = title
+                tag_lists[row] = tags
+        del rows
+        count = len(video_ids)
+        self._count = count
+
+        self._titles, self._title_offsets = _blob(titles)
+        self._titles_nocase, self._title_nocase_offsets = _blob(
+            title.lower() + _SEPARATOR.decode() for title in titles)
+        self._ids, self._id_offsets = _blob(video_ids)
+        # Rows in id order, for binary search by id. Code point order of
+        # strings matches byte order of their utf-8 encodings.
+        self._id_order = array(
+            "I", sorted(range(count), key=video_ids.__getitem__))
+        # Rows in title order, ties kept in catalog order, and the position
+        # of each row within that order.
+        self._title_order = array(
+            "I", sorted(range(count), key=titles.__getitem__))
+        self._title_rank = array("I", bytes(4 * count))
+        for rank, row in enumerate(self._title_order):
+            self._title_rank[row] = rank
+
+        # Tags are stored as ids into a table of distinct tags.
+        tag_table = {}
+        self._tag_ids = array("I")
+        self._tag_offsets = array("q", [0])
+        postings = {}
+        for row, tags in enumerate(tag_lists):
+            for tag in tags:
+                self._tag_ids.append(tag_table.setdefault(tag, len(tag_table)))
+            self._tag_offsets.append(len(self._tag_ids))
+            for tag in {tag.lower() for tag in tags}:
+                postings.setdefault(tag, []).append(row)
+        self._tag_names = list(tag_table)
+        # Maps a lower case tag to its rows in title order.
+        rank = self._title_rank
+        self._tag_index = {
+            tag: array("I", sorted(tag_rows, key=rank.__getitem__))
+            for tag, tag_rows in postings.items()}
+        self._ranked_index = None
+
+        self._init_flags()
+
+    def _init_flags(self):
+        # One bit per row, plus the reasons of the flagged rows. Eight rows
+        # share each byte, so bits are only changed while holding the lock.
+        self._flags = bytearray((self._count + 7) // 8)
+        self._flag_reasons = {}
+        self._flag_lock = threading.RLock()
+        # If set, the FlagStore every flag change is recorded to.
+        self._flag_store = None
+
+    def share_flags(self, reason_size=256):
+        """Moves the flag state into shared memory, so that processes forked
+        after this call see each other's flag changes. Flags set so far are
+        kept.
+
+        Args:
+            reason_size: Bytes of shared memory set aside for the flag reason
+                of each video. Flagging a video with a reason that does not
+                fit in reason_size - 2 bytes of utf-8 raises ValueError.
+        """
+        with self._flag_lock:
+            flags = mmap.mmap(-1, max(len(self._flags), 1))
+            flags[:len(self._flags)] = self._flags
+            reasons = _SharedFlagReasons(self._count, reason_size)
+            for row, reason in self._flag_reasons.items():
+                reasons[row] = reason
+            self._flags = flags
+            self._flag_reasons = reasons
+            self._flag_lock = multiprocessing.get_context("fork").RLock()
+
+    @classmethod
+    def open_compiled(cls, compiled_path):
+        """Opens a catalog written by compile(). The file is memory-mapped
+        rather than read, so opening takes constant time and processes
+        opening the same file share its pages.
+
+        Args:
+            compiled_path: Path of the compiled catalog.
+
+        Returns:
+            A ColumnarVideoLibrary backed by the mapped file.
+        """
+        library = cls.__new__(cls)
+        library._map(compiled_path)
+        return library
+
+    def _map(self, compiled_path):
+        with open(compiled_path, "rb") as compiled_file:
+            mapped = mmap.mmap(compiled_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, little_endian, uint_size, offset_size, count,
+             section_count) = _HEADER.unpack_from(mapped)
+        except struct.error:
+            magic = None
+        if magic != _MAGIC or section_count != len(_SECTIONS):
+            raise ValueError(
+                "{0} is not a compiled catalog".format(compiled_path))
+        if (little_endian != (sys.byteorder == "little")
+                or uint_size != array("I").itemsize
+                or offset_size != array("q").itemsize):
+            raise ValueError(
+                "{0} was compiled on a machine with a different byte "
+                "order or integer size".format(compiled_path))
+
+        view = memoryview(mapped)
+        columns = {}
+        for i, (name, typecode) in enumerate(_SECTIONS):
+            offset, length = _SECTION.unpack_from(
+                mapped, _HEADER.size + i * _SECTION.size)
+            item_size = array(typecode).itemsize if typecode else 1
+            if (offset + length > len(mapped) or offset % item_size
+                    or length % item_size):
+                raise ValueError("{0} is truncated or corrupt: section {1} "
+                                 "does not fit".format(compiled_path, name))
+            if name == "_titles_nocase":
+                columns[name] = _MappedBlob(mapped, offset, length)
+            elif typecode:
+                columns[name] = view[offset:offset + length].cast(typecode)
+            else:
+                columns[name] = view[offset:offset + length]
+
+        self._mapped = mapped
+        self._count = count
+        for name, _ in _SECTIONS:
+            if name.startswith("_"):
+                setattr(self, name, columns[name])
+        self._tag_names = _unpack(
+            columns["tag_names"], columns["tag_name_offsets"])
+        postings = columns["tag_postings"]
+        posting_offsets = columns["tag_posting_offsets"]
+        self._tag_index = {
+            tag: postings[posting_offsets[i]:posting_offsets[i + 1]]
+            for i, tag in enumerate(
+                _unpack(columns["tag_keys"], columns["tag_key_offsets"]))}
+        self._ranked_index = None
+        self._init_flags()
+
+    def compile(self, compiled_path):
+        """Writes the library's columns, sort orders and tag index to a
+        compiled catalog that open_compiled() can map. Flag state is not
+        written.
+
+        Args:
+            compiled_path: Path of the compiled catalog to write.
+        """
+        tag_keys = sorted(self._tag_index)
+        tag_postings = array("I")
+        tag_posting_offsets = array("q", [0])
+        for tag in tag_keys:
+            tag_postings.extend(self._tag_index[tag])
+            tag_posting_offsets.append(len(tag_postings))
+        columns = {}
+        columns["tag_names"], columns["tag_name_offsets"] = _blob(
+            self._tag_names)
+        columns["tag_keys"], columns["tag_key_offsets"] = _blob(tag_keys)
+        columns["tag_postings"] = tag_postings
+        columns["tag_posting_offsets"] = tag_posting_offsets
+
+        sections = [bytes(columns[name] if name in columns
+                          else getattr(self, name))
+                    for name, _ in _SECTIONS]
+        with open(compiled_path, "wb") as compiled_file:
+            compiled_file.write(_HEADER.pack(
+                _MAGIC, sys.byteorder == "little", array("I").itemsize,
+                array("q").itemsize, self._count, len(sections)))
+            table_end = _HEADER.size + _SECTION.size * len(sections)
+            position = table_end + -table_end % 8
+            for section in sections:
+                compiled_file.write(_SECTION.pack(position, len(section)))
+                position += len(section) + -len(section) % 8
+            compiled_file.write(bytes(-table_end % 8))
+            for section in sections:
+                compiled_file.write(section)
+                compiled_file.write(bytes(-len(section) % 8))
+
+    def _title(self, row):
+        offsets = self._title_offsets
+        return str(self._titles[offsets[row]:offsets[row + 1]], "utf-8")
+
+    def _video_id_bytes(self, row):
+        offsets = self._id_offsets
+        return bytes(self._ids[offsets[row]:offsets[row + 1]])
+
+    def _video_id(self, row):
+        return self._video_id_bytes(row).decode("utf-8")
+
+    def _tags(self, row):
+        tag_ids = self._tag_ids
+        tag_names = self._tag_names
+        return tuple(tag_names[tag_ids[i]] for i in
+                     range(self._tag_offsets[row], self._tag_offsets[row + 1]))
+
+    def _find_row(self, video_id):
+        """Returns the row holding a video id, or None if there is none."""
+        key = video_id.encode("utf-8")
+        id_order = self._id_order
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._video_id_bytes(id_order[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._video_id_bytes(id_order[lo]) == key:
+            return id_order[lo]
+        return None
+
+    def _video(self, row):
+        return _ColumnarVideo(self, row)
+
+    def _is_flagged(self, row):
+        return bool(self._flags[row >> 3] & (1 << (row & 7)))
+
+    def _flag_reason(self, row):
+        # Hold the lock so that a reason being rewritten by another thread or
+        # process is never read half written.
+        with self._flag_lock:
+            if self._is_flagged(row):
+                return self._flag_reasons.get(row, "")
+            return ""
+
+    def _set_flag(self, row, reason):
+        with self._flag_lock:
+            self._flag_reasons[row] = reason
+            self._flags[row >> 3] |= 1 << (row & 7)
+
+    def _clear_flag(self, row):
+        with self._flag_lock:
+            self._flags[row >> 3] &= ~(1 << (row & 7))
+            self._flag_reasons.pop(row, None)
+
+    def __len__(self):
+        return self._count
+
+    def flag_video(self, video, reason):
+        """Flags a video so it is no longer picked at random. Once the flags
+        are shared, a reason longer than share_flags() left room for raises
+        ValueError and leaves the video unflagged. So does an OSError
+        raised by the FlagStore when the flag cannot be recorded.
+
+        Args:
+            video: The video object to be flagged.
+            reason: The reason for flagging the video.
+
+        Returns:
+            True if the video was flagged, False if it already was.
+        """
+        with self._flag_lock:
+            if video.flagged:
+                return False
+            video.flag(reason)
+            if self._flag_store is not None:
+                try:
+                    self._flag_store.record_flag(
+                        video.video_id, video.flagged_reason)
+                except OSError:
+                    video.unflag()
+                    raise
+            return True
+
+    def allow_video(self, video):
+        """Removes the flag from a video so it can be picked at random again.
+        If the change cannot be recorded to the FlagStore, its OSError is
+        raised and the video is left flagged.
+
+        Args:
+            video: The video object to be allowed.
+
+        Returns:
+            True if the flag was removed, False if the video was not flagged.
+        """
+        with self._flag_lock:
+            if not video.flagged:
+                return False
+            reason = video.flagged_reason
+            video.unflag()
+            if self._flag_store is not None:
+                try:
+                    self._flag_store.record_allow(video.video_id)
+                except OSError:
+                    video.flag(reason)
+                    raise
+            return True
+
+    def persist_flags(self, flag_store):
+        """Restores the flags kept in a FlagStore and records every later
+        flag change to it.
+
+        Args:
+            flag_store: The FlagStore to restore from and record to.
+        """
+        with self._flag_lock:
+            self._flag_store = None
+            restore_flags(self, flag_store)
+            self._flag_store = flag_store
+
+    def get_random_video(self, rng=random):
+        """Returns a random unflagged video, all being equally likely.
+
+        Rows are drawn at random until an unflagged one comes up, which takes
+        a constant number of draws on average unless most videos are flagged.
+
+        Args:
+            rng: The random number generator to use. Defaults to the random
+                module.
+
+        Returns:
+            A Video object. None if every video is flagged.
+        """
+        if not self._count:
+            return None
+        for _ in range(_RANDOM_ATTEMPTS):
+            row = rng.randrange(self._count)
+            if not self._is_flagged(row):
+                return self._video(row)
+        rows = [row for row in range(self._count) if not self._is_flagged(row)]
+        return self._video(rows[rng.randrange(len(rows))]) if rows else None
+
+    def get_all_videos(self):
+        """Returns all available video information from the video library,
+        as a sequence creating each video view only when it is reached."""
+        return _ColumnarVideos(self, range(self._count))
+
+    def get_videos_by_title(self):
+        """Returns all videos in the video library, sorted by title, as a
+        sequence creating each video view only when it is reached."""
+        return _ColumnarVideos(self, self._title_order)
+
+    def get_video(self, video_id):
+        """Returns the video object (title, url, tags) from the video library.
+
+        Args:
+            video_id: The video url.
+
+        Returns:
+            The Video object for the requested video_id. None if the video
+            does not exist.
+        """
+        row = self._find_row(video_id)
+        return None if row is None else self._video(row)
+
+    def get_videos(self, video_ids):
+        """Returns the video objects for several video ids in one call.
+
+        Args:
+            video_ids: An iterable of video urls.
+
+        Returns:
+            A list with the Video object for each requested video_id, in the
+            same order. None in place of any video that does not exist.
+        """
+        return list(map(self.get_video, video_ids))
+
+    def _videos_at(self, rows, include_flagged, limit=None):
+        if not include_flagged:
+            rows = (row for row in rows if not self._is_flagged(row))
+        return [self._video(row) for row in itertools.islice(rows, limit)]
+
+    def get_videos_with_tag(self, video_tag, include_flagged=True,
+                            limit=None):
+        """Returns the videos carrying a tag, sorted by title.
+
+        Args:
+            video_tag: The tag to look up (case insensitive).
+            include_flagged: If false, flagged videos are left out. Unlike
+                VideoLibrary, results are not cached, since flags may be
+                shared with other processes.
+            limit: If given, only the first limit videos are returned.
+
+        Returns:
+            A list of Video objects. Empty if no video carries the tag.
+        """
+        return self._videos_at(self._tag_index.get(video_tag.lower(), ()),
+                               include_flagged, limit)
+
+    def search_titles(self, search_term, include_flagged=True, limit=None):
+        """Returns the videos whose titles contain a search term, sorted by
+        title.
+
+        Args:
+            search_term: The substring to look for (case insensitive).
+            include_flagged: If false, flagged videos are left out. Unlike
+                VideoLibrary, results are not cached, since flags may be
+                shared with other processes.
+            limit: If given, only the first limit videos are returned.
+
+        Returns:
+            A list of Video objects. Empty if no title matches.
+        """
+        term_nocase = search_term.lower().encode("utf-8")
+        if not term_nocase:
+            return self._videos_at(self._title_order, include_flagged, limit)
+        if _SEPARATOR in term_nocase:
+            return []
+        # Scan the blob of all titles once, skipping to the next title after
+        # each match.
+        blob = self._titles_nocase
+        offsets = self._title_nocase_offsets
+        rows = []
+        position = blob.find(term_nocase)
+        while position != -1:
+            row = bisect.bisect_right(offsets, position) - 1
+            rows.append(row)
+            position = blob.find(term_nocase, offsets[row + 1])
+        if not include_flagged:
+            rows = [row for row in rows if not self._is_flagged(row)]
+        if limit is None:
+            rows.sort(key=self._title_rank.__getitem__)
+        else:
+            rows = heapq.nsmallest(limit, rows, key=self._title_rank.__getitem__)
+        return [self._video(row) for row in rows]
+
+    def search_titles_ranked(self, query, include_flagged=True, limit=None):
+        """Returns the videos whose titles best match a word query, best
+        first. Titles are scored with BM25, and equal scores are sorted by
+        title.
+
+        The word index is not part of the columns. It is built on the first
+        ranked search, by each process that searches.
+
+        Args:
+            query: The words to look for (case insensitive). Every word must
+                be in the title, unless words are separated by OR. A word
+                ending in * matches any word starting with it.
+            include_flagged: If false, flagged videos are left out.
+            limit: If given, only the best limit videos are returned.
+
+        Returns:
+            A list of Video objects. Empty if no title matches.
+        """
+        if self._ranked_index is None:
+            ranked_index = TitleIndex()
+            for row in range(self._count):
+                ranked_index.add(row, self._title(row))
+            self._ranked_index = ranked_index
+        accept = None
+        if not include_flagged:
+            def accept(row):
+                return not self._is_flagged(row)
+        rows = self._ranked_index.search(
+            query, self._title_rank.__getitem__, accept, limit)
+        return [self._video(row) for row in rows]
+
+
+def compile_catalog(catalog_path, compiled_path):
+    """Compiles a pipe-delimited catalog into the binary format read by
+    ColumnarVideoLibrary.open_compiled().
+
+    Args:
+        catalog_path: Path of the catalog to compile.
+        compiled_path: Path of the compiled catalog to write.
+    """
+    ColumnarVideoLibrary(catalog_path).compile(compiled_path)
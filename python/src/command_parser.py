@@ -1,6 +1,8 @@
 """A command parser class."""
 
+import sys
 import textwrap
+import time
 from typing import Sequence
 
 
@@ -9,130 +11,150 @@ class CommandException(Exception):
     pass
 
 
+# The built-in commands: the verb, the VideoPlayer method that runs it, the
+# numbers of arguments it accepts (None to ignore any arguments) and the
+# message shown when it is given a different number of arguments. A range
+# accepts any number of arguments within it.
+_BUILTIN_COMMANDS = (
+    ("NUMBER_OF_VIDEOS", "number_of_videos", None, None),
+    ("SHOW_ALL_VIDEOS", "show_all_videos", None, None),
+    ("PLAY", "play_video", (1,),
+     "Please enter PLAY command followed by video_id."),
+    ("PLAY_RANDOM", "play_random_video", None, None),
+    ("STOP", "stop_video", None, None),
+    ("PAUSE", "pause_video", None, None),
+    ("CONTINUE", "continue_video", None, None),
+    ("SHOW_PLAYING", "show_playing", None, None),
+    ("CREATE_PLAYLIST", "create_playlist", (1,),
+     "Please enter CREATE_PLAYLIST command followed by a playlist name."),
+    ("ADD_TO_PLAYLIST", "add_to_playlist", (2,),
+     "Please enter ADD_TO_PLAYLIST command followed by a playlist name and "
+     "video_id to add."),
+    ("REMOVE_FROM_PLAYLIST", "remove_from_playlist", (2,),
+     "Please enter REMOVE_FROM_PLAYLIST command followed by a playlist name "
+     "and video_id to remove."),
+    ("CLEAR_PLAYLIST", "clear_playlist", (1,),
+     "Please enter CLEAR_PLAYLIST command followed by a playlist name."),
+    ("DELETE_PLAYLIST", "delete_playlist", (1,),
+     "Please enter DELETE_PLAYLIST command followed by a playlist name."),
+    ("SHOW_PLAYLIST", "show_playlist", (1,),
+     "Please enter SHOW_PLAYLIST command followed by a playlist name."),
+    ("SHOW_ALL_PLAYLISTS", "show_all_playlists", None, None),
+    ("SEARCH_VIDEOS", "search_videos", (1,),
+     "Please enter SEARCH_VIDEOS command followed by a search term."),
+    ("SEARCH_VIDEOS_WITH_TAG", "search_videos_tag", (1,),
+     "Please enter SEARCH_VIDEOS_WITH_TAG command followed by a video tag."),
+    ("SEARCH_VIDEOS_RANKED", "search_videos_ranked", range(1, sys.maxsize),
+     "Please enter SEARCH_VIDEOS_RANKED command followed by one or more "
+     "search words."),
+    ("FLAG_VIDEO", "flag_video", (1, 2),
+     "Please enter FLAG_VIDEO command followed by a video_id and an "
+     "optional flag reason."),
+    ("ALLOW_VIDEO", "allow_video", (1,),
+     "Please enter ALLOW_VIDEO command followed by a video_id."),
+    ("NEXT", "next_results", None, None),
+    ("PREV", "previous_results", None, None),
+)
+
+
+class _Command:
+    """A class used to represent a registered command."""
+
+    def __init__(self, handler, arg_counts, usage, help_line):
+        self.handler = handler
+        self.arg_counts = arg_counts
+        self.usage = usage
+        self.help_line = help_line
+
+    def run(self, args):
+        """Runs the command with the arguments that followed its verb.
+           Raises CommandException if it does not accept that many arguments.
+        """
+        if self.arg_counts is None:
+            return self.handler()
+        if len(args) not in self.arg_counts:
+            raise CommandException(self.usage)
+        return self.handler(*args)
+
+
 class CommandParser:
     """A class used to parse and execute a user Command."""
 
-    def __init__(self, video_player):
+    def __init__(self, video_player, stats=None):
+        """The CommandParser class is initialized.
+
+        Args:
+            video_player: The VideoPlayer commands are run on.
+            stats: A CommandStats to record every command to. None disables
+                instrumentation, leaving no per-command overhead.
+        """
         self._player = video_player
+        self._stats = stats
+        # Maps an upper case verb to its _Command.
+        self._commands = {}
+        for verb, method, arg_counts, usage in _BUILTIN_COMMANDS:
+            self.register_command(
+                verb, getattr(video_player, method), arg_counts, usage)
+        self.register_command("HELP", self._get_help)
+        self.register_command(
+            "STATS", self._show_stats,
+            help_line="STATS - Shows how often each command ran and how long "
+                      "it took.")
+
+    @property
+    def stats(self):
+        """Returns the CommandStats commands are recorded to, or None."""
+        return self._stats
+
+    def register_command(self, verb, handler, arg_counts=None, usage=None,
+                         help_line=None):
+        """Registers a command, replacing any command with the same verb.
+
+        Args:
+            verb: The command name (case insensitive).
+            handler: Called with the arguments that follow the verb.
+            arg_counts: The numbers of arguments the command accepts. None to
+                call handler without arguments, ignoring any given.
+            usage: The message of the CommandException raised when the
+                command is given a number of arguments it does not accept.
+            help_line: A line describing the command, listed by HELP.
+        """
+        self._commands[verb.upper()] = _Command(
+            handler, arg_counts, usage, help_line)
 
     def execute_command(self, command: Sequence[str]):
         """Executes the user command. Expects the command to be upper case.
            Raises CommandException if a command cannot be parsed.
         """
+        if self._stats is None:
+            return self._execute(command)
+        # Empty and unknown commands are recorded together rather than per
+        # verb, so that typos cannot grow the statistics without bound.
+        verb = command[0].upper() if command else "INVALID"
+        if verb not in self._commands:
+            verb = "INVALID"
+        start = time.perf_counter()
+        try:
+            self._execute(command)
+        except CommandException:
+            self._stats.record(verb, time.perf_counter() - start, True)
+            raise
+        self._stats.record(verb, time.perf_counter() - start)
+
+    def _execute(self, command):
         if not command:
             raise CommandException(
                 "Please enter a valid command, "
                 "type HELP for a list of available commands.")
 
-        if command[0].upper() == "NUMBER_OF_VIDEOS":
-            self._player.number_of_videos()
-
-        elif command[0].upper() == "SHOW_ALL_VIDEOS":
-            self._player.show_all_videos()
-
-        elif command[0].upper() == "PLAY":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter PLAY command followed by video_id.")
-            self._player.play_video(command[1])
-
-        elif command[0].upper() == "PLAY_RANDOM":
-            self._player.play_random_video()
-
-        elif command[0].upper() == "STOP":
-            self._player.stop_video()
-
-        elif command[0].upper() == "PAUSE":
-            self._player.pause_video()
-
-        elif command[0].upper() == "CONTINUE":
-            self._player.continue_video()
-
-        elif command[0].upper() == "SHOW_PLAYING":
-            self._player.show_playing()
-
-        elif command[0].upper() == "CREATE_PLAYLIST":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter CREATE_PLAYLIST command followed by a "
-                    "playlist name.")
-            self._player.create_playlist(command[1])
-
-        elif command[0].upper() == "ADD_TO_PLAYLIST":
-            if len(command) != 3:
-                raise CommandException(
-                    "Please enter ADD_TO_PLAYLIST command followed by a "
-                    "playlist name and video_id to add.")
-            self._player.add_to_playlist(command[1], command[2])
-
-        elif command[0].upper() == "REMOVE_FROM_PLAYLIST":
-            if len(command) != 3:
-                raise CommandException(
-                    "Please enter REMOVE_FROM_PLAYLIST command followed by a "
-                    "playlist name and video_id to remove.")
-            self._player.remove_from_playlist(command[1], command[2])
-
-        elif command[0].upper() == "CLEAR_PLAYLIST":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter CLEAR_PLAYLIST command followed by a "
-                    "playlist name.")
-            self._player.clear_playlist(command[1])
-
-        elif command[0].upper() == "DELETE_PLAYLIST":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter DELETE_PLAYLIST command followed by a "
-                    "playlist name.")
-            self._player.delete_playlist(command[1])
-
-        elif command[0].upper() == "SHOW_PLAYLIST":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter SHOW_PLAYLIST command followed by a "
-                    "playlist name.")
-            self._player.show_playlist(command[1])
-
-        elif command[0].upper() == "SHOW_ALL_PLAYLISTS":
-            self._player.show_all_playlists()
-
-        elif command[0].upper() == "SEARCH_VIDEOS":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter SEARCH_VIDEOS command followed by a "
-                    "search term.")
-            self._player.search_videos(command[1])
-
-        elif command[0].upper() == "SEARCH_VIDEOS_WITH_TAG":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter SEARCH_VIDEOS_WITH_TAG command followed by a "
-                    "video tag.")
-            self._player.search_videos_tag(command[1])
-
-        elif command[0].upper() == "FLAG_VIDEO":
-            if len(command) == 3:
-                self._player.flag_video(command[1], command[2])
-            elif len(command) == 2:
-                self._player.flag_video(command[1])
+        with self._player.output.command():
+            registered = self._commands.get(command[0].upper())
+            if registered is None:
+                self._player.output.write_error(
+                    "Please enter a valid command, type HELP for a list of "
+                    "available commands.")
             else:
-                raise CommandException(
-                    "Please enter FLAG_VIDEO command followed by a "
-                    "video_id and an optional flag reason.")
-
-        elif command[0].upper() == "ALLOW_VIDEO":
-            if len(command) != 2:
-                raise CommandException(
-                    "Please enter ALLOW_VIDEO command followed by a "
-                    "video_id.")
-            self._player.allow_video(command[1])
-
-        elif command[0].upper() == "HELP":
-            self._get_help()
-        else:
-            print(
-                "Please enter a valid command, type HELP for a list of "
-                "available commands.")
+                registered.run(command[1:])
 
     def _get_help(self):
         """Displays all available commands to the user."""
@@ -155,9 +177,26 @@ class CommandParser:
             SHOW_ALL_PLAYLISTS - Display all the available playlists.
             SEARCH_VIDEOS <search_term> - Display all the videos whose titles contain the search_term.
             SEARCH_VIDEOS_WITH_TAG <tag_name> -Display all videos whose tags contains the provided tag.
+            SEARCH_VIDEOS_RANKED <words> - Display the videos whose titles best match the words. Separate alternatives with OR, and end a word with * to match words starting with it.
             FLAG_VIDEO <video_id> <flag_reason> - Mark a video as flagged.
             ALLOW_VIDEO <video_id> - Removes a flag from a video.
+            NEXT - Shows the next page of search results.
+            PREV - Shows the previous page of search results.
             HELP - Displays help.
             EXIT - Terminates the program execution.
         """)
-        print(help_text)
+        extra_lines = [registered.help_line for registered
+                       in self._commands.values() if registered.help_line]
+        if extra_lines:
+            help_text = help_text + textwrap.indent(
+                "\n".join(extra_lines), "    ") + "\n"
+        self._player.output.write_line(help_text)
+
+    def _show_stats(self):
+        """Displays the statistics of each command run so far."""
+        if self._stats is None:
+            self._player.output.write_line("Command statistics are not enabled")
+            return
+        self._player.output.write_line("Command statistics:")
+        for line in self._stats.format():
+            self._player.output.write_line("    " + line)
@@ -0,0 +1,102 @@
+"""A command statistics class."""
+
+import math
+import threading
+
+# Each power of two of latency is split into this many histogram buckets, so
+# a percentile read from the histogram is off by at most 1 / _SUB_BUCKETS.
+_SUB_BUCKETS = 8
+
+
+def _bucket(seconds):
+    """Returns the histogram bucket of a latency."""
+    mantissa, exponent = math.frexp(seconds * 1e6)
+    if not mantissa:
+        return 0
+    return max(exponent * _SUB_BUCKETS + int((mantissa - 0.5) * 2 * _SUB_BUCKETS), 0)
+
+
+def _bucket_limit(bucket):
+    """Returns the largest latency in seconds falling into a bucket."""
+    exponent, sub_bucket = divmod(bucket, _SUB_BUCKETS)
+    return math.ldexp(0.5 + (sub_bucket + 1) / (2 * _SUB_BUCKETS), exponent) / 1e6
+
+
+class _VerbStats:
+    """A class used to represent the statistics of one verb."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        # Maps a histogram bucket to the number of calls that fell into it.
+        self.histogram = {}
+
+    def percentile(self, fraction):
+        """Returns the latency in seconds that this fraction of calls did not
+        exceed, to the precision of the histogram."""
+        rank = math.ceil(self.calls * fraction)
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= rank:
+                return _bucket_limit(bucket)
+        return 0.0
+
+
+class CommandStats:
+    """A class used to collect how often each command is run, how often it
+    fails and how long it takes. Latencies are kept in fixed-size histograms,
+    so memory does not grow with the number of calls."""
+
+    def __init__(self):
+        # Maps an upper case verb to its _VerbStats.
+        self._verbs = {}
+        self._lock = threading.Lock()
+
+    def record(self, verb, seconds, error=False):
+        """Records one command.
+
+        Args:
+            verb: The upper case verb of the command.
+            seconds: How long the command took.
+            error: True if the command raised a CommandException.
+        """
+        bucket = _bucket(seconds)
+        with self._lock:
+            stats = self._verbs.get(verb)
+            if stats is None:
+                stats = self._verbs[verb] = _VerbStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.seconds += seconds
+            stats.histogram[bucket] = stats.histogram.get(bucket, 0) + 1
+
+    def snapshot(self):
+        """Returns the statistics collected so far.
+
+        Returns:
+            A dict mapping each verb, in alphabetical order, to a dict with
+            its number of calls and errors and its mean, p50 and p99
+            latencies in seconds.
+        """
+        with self._lock:
+            return {verb: {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "mean": stats.seconds / stats.calls,
+                "p50": stats.percentile(0.5),
+                "p99": stats.percentile(0.99),
+            } for verb, stats in sorted(self._verbs.items())}
+
+    def format(self):
+        """Returns one line per verb describing its statistics."""
+        return ["{0}: {1} calls, {2} errors, p50 {3:.3f}ms, p99 {4:.3f}ms".format(
+                    verb, stats["calls"], stats["errors"], stats["p50"] * 1e3,
+                    stats["p99"] * 1e3)
+                for verb, stats in self.snapshot().items()]
+
+    def reset(self):
+        """Forgets all statistics collected so far."""
+        with self._lock:
+            self._verbs = {}
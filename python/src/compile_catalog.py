@@ -0,0 +1,15 @@
+"""Compiles a video catalog into the binary format the simulator can map."""
+from .columnar_library import compile_catalog
+from .video_library import DEFAULT_CATALOG_PATH
+import argparse
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "catalog", nargs="?", default=DEFAULT_CATALOG_PATH,
+        help="path of the catalog to compile "
+             "(defaults to the bundled videos.txt)")
+    arg_parser.add_argument("output", help="path of the compiled catalog")
+    args = arg_parser.parse_args()
+    compile_catalog(args.catalog, args.output)
@@ -0,0 +1,247 @@
+"""A persistent flag store class."""
+
+from .json_lines import read_json_lines
+from pathlib import Path
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import weakref
+
+# Compact the log once it holds this many superseded entries.
+_COMPACT_SLACK = 1024
+
+
+def _before_fork(store_ref):
+    store = store_ref()
+    if store is not None:
+        store._before_fork()
+
+
+def _after_fork(store_ref):
+    store = store_ref()
+    if store is not None:
+        store._after_fork()
+
+
+def restore_flags(video_library, flag_store):
+    """Flags the videos of a library that a FlagStore holds flagged.
+
+    Args:
+        video_library: The library to flag videos in.
+        flag_store: The FlagStore to read the flags from. Ids of videos
+            missing from the library are skipped.
+    """
+    flags = flag_store.flags
+    for video in video_library.get_videos(flags):
+        if video is not None:
+            video_library.flag_video(video, flags[video.video_id][0])
+
+
+class FlagStore:
+    """A class used to persist flagged videos across restarts.
+
+    Every flag change is appended to a log as one JSON line holding the video
+    id, the time and, for a flag, the reason. Changes are written by a
+    background thread in batches, so a burst of changes shares one fsync
+    instead of paying one each. A change is durable once sync() returns, or
+    at the latest commit_interval seconds after it was recorded.
+
+    Once the log holds enough superseded entries, it is rewritten with just
+    the current flags. After the process forks, the log is shared with the
+    children and each process only knows its own changes, so it is only
+    compacted again when next opened.
+    """
+
+    def __init__(self, path, commit_interval=0.01, fsync=True):
+        """The FlagStore class is initialized, reading the flags previously
+        stored at path.
+
+        Args:
+            path: The path of the flag log. Created if missing.
+            commit_interval: Seconds to wait for more changes before writing
+                a batch.
+            fsync: If false, batches are written but not fsynced, leaving
+                durability to the operating system.
+        """
+        self._path = Path(path)
+        self._commit_interval = commit_interval
+        self._fsync = fsync
+        # Maps the id of each flagged video to its reason and the time it
+        # was flagged.
+        self._flags = {}
+        # The number of entries in the log, and whether it may be shared
+        # with forked processes.
+        self._entries = 0
+        self._forked = False
+        self._recover()
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                           0o644)
+        self._closed = False
+        self._start_writer()
+        # Fork hooks cannot be unregistered, so the hooks only hold a weak
+        # reference, letting a closed store be freed.
+        store_ref = weakref.ref(self)
+        os.register_at_fork(
+            before=functools.partial(_before_fork, store_ref),
+            after_in_child=functools.partial(_after_fork, store_ref))
+        atexit.register(self.close)
+
+    def _recover(self):
+        for kind, timestamp, video_id, *reason in read_json_lines(self._path):
+            self._entries += 1
+            if kind == "F":
+                self._flags[video_id] = (reason[0], timestamp)
+            else:
+                self._flags.pop(video_id, None)
+        if self._entries - len(self._flags) > _COMPACT_SLACK:
+            self._compact(self._flags)
+
+    def _compact(self, flags):
+        """Replaces the log with one holding just flags."""
+        temporary_path = self._path.with_suffix(".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as log_file:
+            for video_id, (reason, timestamp) in flags.items():
+                log_file.write(json.dumps(["F", timestamp, video_id, reason]) + "\n")
+            log_file.flush()
+            os.fsync(log_file.fileno())
+        os.replace(temporary_path, self._path)
+        self._entries = len(flags)
+
+    def _compact_running(self):
+        """Compacts the log from the writer thread. Changes still pending
+        are already in the flags written, and appending them again after
+        leaves the same flags."""
+        with self._condition:
+            if self._forked or self._entries - len(self._flags) <= _COMPACT_SLACK:
+                return
+            flags = dict(self._flags)
+        self._compact(flags)
+        fd = os.open(self._path, os.O_WRONLY | os.O_APPEND)
+        os.close(self._fd)
+        self._fd = fd
+
+    def _start_writer(self):
+        self._condition = threading.Condition()
+        self._pending = []
+        self._recorded = 0
+        self._committed = 0
+        self._commits = 0
+        self._syncing = 0
+        self._closing = False
+        self._error = None
+        self._writer = threading.Thread(target=self._write_batches, daemon=True)
+        self._writer.start()
+
+    def _before_fork(self):
+        self._forked = True
+
+    def _after_fork(self):
+        # Only the forking thread survives in the child, so it needs a writer
+        # of its own. Changes still pending belong to the parent.
+        if not self._closed:
+            self._start_writer()
+
+    def _write_batches(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._pending or self._closing)
+                if not self._pending:
+                    return
+                # Give concurrent changes a moment to join this batch.
+                self._condition.wait_for(
+                    lambda: self._closing or self._syncing,
+                    self._commit_interval)
+                batch = self._pending
+                self._pending = []
+            try:
+                os.write(self._fd, b"".join(batch))
+                if self._fsync:
+                    os.fsync(self._fd)
+                self._entries += len(batch)
+                self._compact_running()
+            except OSError as e:
+                with self._condition:
+                    self._error = e
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._committed += len(batch)
+                self._commits += 1
+                self._condition.notify_all()
+
+    def _record(self, entry):
+        """Queues one log entry. Called holding the condition, before the
+        flags dict is changed, so that the log and the flags dict see
+        changes in the same order and a failed log leaves both unchanged."""
+        if self._error is not None:
+            raise self._error
+        self._pending.append((json.dumps(entry) + "\n").encode("utf-8"))
+        self._recorded += 1
+        self._condition.notify_all()
+
+    @property
+    def flags(self):
+        """Returns a dict mapping the id of each flagged video to its reason
+        and the time it was flagged."""
+        with self._condition:
+            return dict(self._flags)
+
+    @property
+    def commits(self):
+        """Returns the number of batches written so far."""
+        return self._commits
+
+    def record_flag(self, video_id, reason):
+        """Records that a video was flagged. If writing the log has failed,
+        the OSError it failed with is raised and nothing is recorded.
+
+        Args:
+            video_id: The id of the flagged video.
+            reason: The reason it was flagged.
+        """
+        timestamp = round(time.time(), 3)
+        with self._condition:
+            self._record(["F", timestamp, video_id, reason])
+            self._flags[video_id] = (reason, timestamp)
+
+    def record_allow(self, video_id):
+        """Records that the flag was removed from a video. If writing the
+        log has failed, the OSError it failed with is raised and nothing is
+        recorded.
+
+        Args:
+            video_id: The id of the allowed video.
+        """
+        with self._condition:
+            self._record(["A", round(time.time(), 3), video_id])
+            self._flags.pop(video_id, None)
+
+    def sync(self):
+        """Waits until every change recorded so far is durable."""
+        with self._condition:
+            target = self._recorded
+            self._syncing += 1
+            self._condition.notify_all()
+            try:
+                self._condition.wait_for(
+                    lambda: self._committed >= target or self._error)
+            finally:
+                self._syncing -= 1
+            if self._committed < target:
+                raise self._error
+
+    def close(self):
+        """Writes out the changes still pending and closes the log."""
+        if self._closed:
+            return
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        self._writer.join()
+        self._closed = True
+        os.close(self._fd)
+        atexit.unregister(self.close)
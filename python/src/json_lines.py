@@ -0,0 +1,32 @@
+"""Reads append-only logs of JSON lines."""
+
+import json
+
+
+def read_json_lines(path):
+    """Yields the decoded entries of a log of JSON lines, one per line.
+
+    Reading stops at the first line that is incomplete or not valid JSON,
+    such as an entry torn by a crash mid-append. Once every entry has been
+    read, the log is truncated to the entries read, so that new entries are
+    not appended to the torn one.
+
+    Args:
+        path: The path of the log. Nothing is yielded if it does not exist.
+    """
+    try:
+        log_file = open(path, "r+b")
+    except FileNotFoundError:
+        return
+    with log_file:
+        end = 0
+        for line in log_file:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            end += len(line)
+            yield entry
+        log_file.truncate(end)
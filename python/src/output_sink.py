@@ -0,0 +1,141 @@
+"""Output sink classes for the video player."""
+
+import contextlib
+import sys
+
+
+class OutputSink:
+    """A class used to collect the output of player commands and write it out
+    in one go when each command finishes."""
+
+    def __init__(self, stream=None, autoflush=True):
+        """The OutputSink class is initialized.
+
+        Args:
+            stream: A text stream to write to. Defaults to whatever sys.stdout
+                is when output is flushed.
+            autoflush: If true, the stream itself is flushed after each
+                command. Otherwise the stream's own buffering decides when
+                output is written.
+        """
+        self._stream = stream
+        self._autoflush = autoflush
+        self._lines = []
+        self._depth = 0
+
+    def write_line(self, line):
+        """Buffers one line of output.
+
+        Args:
+            line: The line to write, without a trailing newline.
+        """
+        self._lines.append(line)
+
+    def write_video(self, line, video, number=None):
+        """Buffers a line of output describing a video.
+
+        Args:
+            line: The line to write, without a trailing newline.
+            video: The video the line describes.
+            number: The number the video is listed under, if any.
+        """
+        self.write_line(line)
+
+    def write_error(self, line):
+        """Buffers a line of output saying why a command failed.
+
+        Args:
+            line: The line to write, without a trailing newline.
+        """
+        self.write_line(line)
+
+    @contextlib.contextmanager
+    def command(self):
+        """Context manager wrapping one command. Output is flushed when the
+        outermost command exits, so commands that run other commands still
+        produce a single write."""
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                self.flush()
+
+    def flush(self):
+        """Writes out all buffered lines."""
+        if self._lines:
+            lines = self._lines
+            self._lines = []
+            self._write(lines)
+
+    def _write(self, lines):
+        stream = self._stream or sys.stdout
+        stream.write("\n".join(lines) + "\n")
+        if self._autoflush:
+            stream.flush()
+
+
+class CollectingSink(OutputSink):
+    """An OutputSink that keeps the output of each command as a list of lines
+    instead of writing it to a stream."""
+
+    def __init__(self):
+        super().__init__()
+        self._results = []
+
+    def _write(self, lines):
+        self._results.append(lines)
+
+    def take(self):
+        """Returns the output collected so far, as a list with the lines of
+        each flush, and forgets it."""
+        self.flush()
+        results = self._results
+        self._results = []
+        return results
+
+
+class StructuredSink(OutputSink):
+    """An OutputSink that keeps a record of each command instead of writing
+    it to a stream, so that callers need not parse the text."""
+
+    def __init__(self):
+        super().__init__()
+        self._results = []
+        self._videos = []
+        self._failed = False
+
+    def write_video(self, line, video, number=None):
+        self._videos.append({
+            "number": number,
+            "video_id": video.video_id,
+            "title": video.title,
+            "tags": list(video.tags),
+            "flagged_reason": video.flagged_reason or None,
+        })
+        super().write_video(line, video, number)
+
+    def write_error(self, line):
+        self._failed = True
+        super().write_error(line)
+
+    def _write(self, lines):
+        self._results.append({
+            "status": "error" if self._failed else "ok",
+            "videos": self._videos,
+            "lines": lines,
+        })
+        self._videos = []
+        self._failed = False
+
+    def take(self):
+        """Returns the output collected so far, as a list with a dict for
+        each flush, and forgets it. Each dict holds its "status", "error" if
+        a command failed and "ok" otherwise, the "videos" listed as dicts of
+        their number, video_id, title, tags and flagged_reason, and the
+        text "lines" written."""
+        self.flush()
+        results = self._results
+        self._results = []
+        return results
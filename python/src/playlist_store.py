@@ -0,0 +1,120 @@
+"""A persistent playlist store class."""
+
+from .json_lines import read_json_lines
+from pathlib import Path
+import json
+import os
+
+
+class PlaylistStore:
+    """A class used to persist playlists across restarts.
+
+    Every change is appended to a journal as one JSON line. Every
+    compact_every changes, the current playlists are written to a snapshot
+    and the journal is emptied, so recovery only reads the snapshot and the
+    changes made after it.
+    """
+
+    def __init__(self, directory, compact_every=1000, sync=False):
+        """The PlaylistStore class is initialized, recovering any playlists
+        previously stored in directory.
+
+        Args:
+            directory: The directory holding the snapshot and journal. Created
+                if missing.
+            compact_every: How many changes to journal between snapshots.
+            sync: If true, fsync the journal after every change.
+        """
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._snapshot_path = self._directory / "playlists.snapshot.json"
+        self._journal_path = self._directory / "playlists.journal"
+        self._compact_every = compact_every
+        self._sync = sync
+        # Maps a lower case playlist name to its name and its video ids, both
+        # kept in creation order.
+        self._playlists = {}
+        # Every journalled change has a sequence number. The snapshot records
+        # the last one it includes, so replay skips changes already in it.
+        self._sequence = 0
+        self._journalled = 0
+        self._recover()
+        self._journal = open(self._journal_path, "a", encoding="utf-8")
+
+    def _recover(self):
+        if self._snapshot_path.exists():
+            with open(self._snapshot_path, encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            self._sequence = snapshot["sequence"]
+            for name, video_ids in snapshot["playlists"]:
+                self._playlists[name.lower()] = (name, dict.fromkeys(video_ids))
+        for sequence, operation, *args in read_json_lines(self._journal_path):
+            if sequence > self._sequence:
+                self._apply(operation, args)
+                self._sequence = sequence
+            self._journalled += 1
+
+    def _apply(self, operation, args):
+        if operation == "create":
+            name, = args
+            self._playlists.setdefault(name.lower(), (name, {}))
+            return
+        entry = self._playlists.get(args[0].lower())
+        if entry is None:
+            return
+        video_ids = entry[1]
+        if operation == "add":
+            video_ids.update(dict.fromkeys(args[1:]))
+        elif operation == "remove":
+            for video_id in args[1:]:
+                video_ids.pop(video_id, None)
+        elif operation == "clear":
+            video_ids.clear()
+        elif operation == "delete":
+            del self._playlists[args[0].lower()]
+
+    @property
+    def playlists(self):
+        """Returns the stored playlists in creation order, as a list of
+        (name, video_ids) tuples."""
+        return [(name, list(video_ids))
+                for name, video_ids in self._playlists.values()]
+
+    def record(self, operation, playlist_name, *video_ids):
+        """Journals one change to the playlists.
+
+        Args:
+            operation: One of "create", "add", "remove", "clear" or "delete".
+            playlist_name: The name of the playlist changed.
+            video_ids: The ids of the videos added or removed.
+        """
+        args = [playlist_name, *video_ids]
+        self._apply(operation, args)
+        self._sequence += 1
+        self._journal.write(json.dumps([self._sequence, operation, *args]) + "\n")
+        self._journal.flush()
+        if self._sync:
+            os.fsync(self._journal.fileno())
+        self._journalled += 1
+        if self._journalled >= self._compact_every:
+            self.compact()
+
+    def compact(self):
+        """Writes a snapshot of the current playlists and empties the
+        journal."""
+        snapshot = {"sequence": self._sequence, "playlists": self.playlists}
+        temporary_path = self._snapshot_path.with_suffix(".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary_path, self._snapshot_path)
+        # A crash before the journal is emptied is harmless, since the
+        # snapshot's sequence number makes replay skip what it includes.
+        self._journal.close()
+        self._journal = open(self._journal_path, "w", encoding="utf-8")
+        self._journalled = 0
+
+    def close(self):
+        """Closes the journal."""
+        self._journal.close()
@@ -0,0 +1,110 @@
+"""A pre-fork server running simulator sessions in several worker processes."""
+
+from .command_stats import CommandStats
+from .run import add_library_arguments, add_page_size_argument, open_library
+from .server import VideoServer
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+
+
+def _run_worker(video_library, sock, stats, page_size):
+    async def serve():
+        server = await VideoServer(video_library, stats, page_size).start(
+            sock=sock)
+        async with server:
+            await server.serve_forever()
+
+    # The parent stops workers with SIGTERM. Exit quietly instead of
+    # reporting KeyboardInterrupt tracebacks on Ctrl+C.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(serve())
+
+
+def start_workers(video_library, sock, workers=None, stats=None,
+                  page_size=20):
+    """Forks worker processes serving sessions from one listening socket.
+
+    The library is loaded once by the caller and inherited by the workers, so
+    its columns (or the pages of a compiled catalog) are shared rather than
+    copied, and its flag state is moved into shared memory so that a video
+    flagged in one worker is flagged in all of them.
+
+    Args:
+        video_library: The ColumnarVideoLibrary to serve.
+        sock: A bound, listening socket.
+        workers: The number of worker processes. Defaults to the number of
+            CPUs.
+        stats: A CommandStats to record the commands of each worker to.
+            Every worker records to its own copy, so STATS shows the
+            commands of the worker serving the session.
+        page_size: How many search results each session shows at a time.
+            None shows them all.
+
+    Returns:
+        The list of started worker processes.
+    """
+    video_library.share_flags()
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_run_worker,
+                        args=(video_library, sock, stats, page_size),
+                        daemon=True)
+        for _ in range(workers or os.cpu_count() or 1)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def stop_workers(processes):
+    """Stops worker processes started by start_workers()."""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def serve_prefork(video_library, host="127.0.0.1", port=8888, workers=None,
+                  stats=None, page_size=20):
+    """Serves sessions from worker processes until interrupted.
+
+    Args:
+        video_library: The ColumnarVideoLibrary to serve.
+        host: The address to listen on.
+        port: The TCP port to listen on.
+        workers: The number of worker processes. Defaults to the number of
+            CPUs.
+        stats: As for start_workers().
+        page_size: As for start_workers().
+    """
+    sock = socket.create_server((host, port), backlog=1024)
+    processes = start_workers(video_library, sock, workers, stats, page_size)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_workers(processes)
+        sock.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    add_library_arguments(arg_parser, columnar_only=True)
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8888)
+    arg_parser.add_argument(
+        "--workers", type=int,
+        help="number of worker processes (defaults to the number of CPUs)")
+    arg_parser.add_argument(
+        "--stats", action="store_true",
+        help="record how long each command takes, shown by the STATS command")
+    add_page_size_argument(arg_parser)
+    args = arg_parser.parse_args()
+    serve_prefork(open_library(args), args.host, args.port, args.workers,
+                  CommandStats() if args.stats else None,
+                  args.page_size or None)
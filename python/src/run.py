@@ -1,21 +1,137 @@
 """A youtube terminal simulator."""
 from .video_player import VideoPlayer
+from .video_library import VideoLibrary
+from .columnar_library import ColumnarVideoLibrary
 from .command_parser import CommandException
 from .command_parser import CommandParser
+from .command_stats import CommandStats
+from .batch import run_batch
+from .flag_store import FlagStore
+from .playlist_store import PlaylistStore
+import argparse
+import sys
+
+GREETING = """Hello and welcome to YouTube, what would you like to do?
+    Enter HELP for list of available commands or EXIT to terminate."""
+FAREWELL = ("YouTube has now terminated its execution. "
+            "Thank you and goodbye!")
+PROMPT = "YT> "
+
+
+def add_library_arguments(arg_parser, columnar_only=False):
+    """Adds the options choosing how the video library is loaded.
+
+    Args:
+        arg_parser: The ArgumentParser to add the options to.
+        columnar_only: If true, open_library() always opens a
+            ColumnarVideoLibrary, and the options choosing another kind of
+            library are left out.
+    """
+    arg_parser.add_argument(
+        "--catalog", help="path of the video catalog to load "
+                          "(defaults to the bundled videos.txt)")
+    if columnar_only:
+        arg_parser.set_defaults(lazy=False, columnar=True)
+    else:
+        arg_parser.add_argument(
+            "--lazy", action="store_true",
+            help="parse catalog records on first access instead of at "
+                 "startup")
+        arg_parser.add_argument(
+            "--columnar", action="store_true",
+            help="store the catalog column by column instead of one object "
+                 "per video")
+    arg_parser.add_argument(
+        "--compiled", help="path of a compiled catalog to map instead of "
+                           "parsing a text catalog")
+    arg_parser.add_argument(
+        "--flags", metavar="FILE",
+        help="keep flagged videos in FILE so that they survive a restart")
+
+
+def open_library(args):
+    """Returns the video library chosen by the add_library_arguments options."""
+    if args.compiled:
+        library = ColumnarVideoLibrary.open_compiled(args.compiled)
+    elif args.columnar:
+        library = ColumnarVideoLibrary(args.catalog)
+    else:
+        library = VideoLibrary(args.catalog, lazy=args.lazy)
+    if args.flags:
+        library.persist_flags(FlagStore(args.flags))
+    return library
+
+
+def _page_size(text):
+    """Parses a --page-size value, which must not be negative."""
+    page_size = int(text)
+    if page_size < 0:
+        raise argparse.ArgumentTypeError(
+            "must not be negative: {0}".format(page_size))
+    return page_size
+
+
+def add_page_size_argument(arg_parser):
+    """Adds the option choosing how many search results are shown at a
+    time. Pass its value or None to VideoPlayer's page_size."""
+    arg_parser.add_argument(
+        "--page-size", type=_page_size, default=20, metavar="N",
+        help="show search results N at a time, paged with NEXT and PREV "
+             "(0 shows them all)")
+
+
+def _parse_args():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    add_library_arguments(arg_parser)
+    arg_parser.add_argument(
+        "--batch", metavar="FILE",
+        help="execute the commands in FILE (- for stdin) without prompting, "
+             "then report how fast they ran")
+    arg_parser.add_argument(
+        "--search-answer", metavar="ANSWER",
+        help="in batch mode, answer every search prompt with ANSWER instead "
+             "of reading the answer from the next line")
+    arg_parser.add_argument(
+        "--playlists", metavar="DIR",
+        help="keep playlists in DIR so that they survive a restart")
+    add_page_size_argument(arg_parser)
+    arg_parser.add_argument(
+        "--stats", action="store_true",
+        help="record how long each command takes, shown by the STATS command")
+    return arg_parser.parse_args()
 
 
 if __name__ == "__main__":
-    print("""Hello and welcome to YouTube, what would you like to do?
-    Enter HELP for list of available commands or EXIT to terminate.""")
-    video_player = VideoPlayer()
-    parser = CommandParser(video_player)
+    args = _parse_args()
+    stats = CommandStats() if args.stats else None
+    if args.batch:
+        batch_file = (sys.stdin if args.batch == "-"
+                      else open(args.batch, encoding="utf-8"))
+        with batch_file:
+            commands, seconds = run_batch(
+                batch_file, open_library(args),
+                search_answer=args.search_answer, stats=stats,
+                page_size=args.page_size or None)
+        print("Executed {0} commands in {1:.3f}s ({2:.0f} commands/sec)".format(
+            commands, seconds, commands / seconds if seconds else 0),
+            file=sys.stderr)
+        if stats is not None:
+            print("\n".join(stats.format()), file=sys.stderr)
+        sys.exit()
+    print(GREETING)
+    playlist_store = PlaylistStore(args.playlists) if args.playlists else None
+    video_player = VideoPlayer(open_library(args),
+                               playlist_store=playlist_store,
+                               page_size=args.page_size or None)
+    parser = CommandParser(video_player, stats)
     while True:
-        command = input("YT> ")
+        command = input(PROMPT)
         if command.upper() == "EXIT":
             break
         try:
             parser.execute_command(command.split())
         except CommandException as e:
             print(e)
-    print("YouTube has now terminated its execution. "
-          "Thank you and goodbye!")
+    if playlist_store is not None:
+        playlist_store.close()
+    print(FAREWELL)
@@ -0,0 +1,80 @@
+"""A search result cache class."""
+
+from collections import OrderedDict
+
+
+class SearchCache:
+    """A class used to keep the results of recent searches, evicting the least
+    recently used ones once full. Not thread safe; the owning library's lock
+    guards it.
+
+    A search may be cached complete, or as just its first results when only
+    those were needed. Requests for more results than a partial entry holds
+    are misses.
+    """
+
+    def __init__(self, maxsize=1024):
+        """The SearchCache class is initialized.
+
+        Args:
+            maxsize: How many searches to keep. 0 disables caching.
+        """
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def get(self, key, limit=None):
+        """Returns a copy of the cached results for key, or None if they are
+        not cached.
+
+        Args:
+            key: A (kind, normalized term) tuple.
+            limit: If given, only the first limit results are needed.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        results, complete = entry
+        if not complete and (limit is None or len(results) < limit):
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return results[:limit]
+
+    def put(self, key, results, complete=True):
+        """Caches the results of a search.
+
+        Args:
+            key: A (kind, normalized term) tuple.
+            results: The list of results, or of the first results.
+            complete: False if results only holds the first results.
+        """
+        if not self._maxsize:
+            return
+        self._entries[key] = (results, complete)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, predicate):
+        """Drops every cached search whose key satisfies predicate."""
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+
+    def clear(self):
+        """Drops every cached search."""
+        self._entries.clear()
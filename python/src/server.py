@@ -0,0 +1,150 @@
+"""An asyncio server running one simulator session per connection."""
+
+from .command_parser import CommandException
+from .command_parser import CommandParser
+from .command_stats import CommandStats
+from .output_sink import OutputSink
+from .run import FAREWELL, GREETING, PROMPT
+from .run import add_library_arguments, add_page_size_argument, open_library
+from .video_player import VideoPlayer
+import argparse
+import asyncio
+import contextlib
+
+# Sent before closing a session whose command line exceeds the stream
+# reader's limit, 64 KiB by default.
+LINE_TOO_LONG = "Command is too long, closing the session."
+
+
+class _WriterStream:
+    """A text stream writing to an asyncio StreamWriter. Flow control is left
+    to the session, which drains the writer after each command."""
+
+    def __init__(self, writer):
+        self._writer = writer
+
+    def write(self, text):
+        self._writer.write(text.encode("utf-8"))
+
+    def flush(self):
+        pass
+
+
+class VideoServer:
+    """A class used to serve terminal sessions over TCP or Unix sockets.
+
+    Every connection gets its own VideoPlayer, so playback state and playlists
+    are per session, while all sessions share one video library.
+    """
+
+    def __init__(self, video_library, stats=None, page_size=20):
+        """The VideoServer class is initialized.
+
+        Args:
+            video_library: The library shared by all sessions.
+            stats: A CommandStats recording the commands of all sessions.
+            page_size: How many search results each session shows at a
+                time. None shows them all.
+        """
+        self._video_library = video_library
+        self._stats = stats
+        self._page_size = page_size
+        self._sessions = 0
+
+    @property
+    def sessions(self):
+        """Returns the number of sessions currently connected."""
+        return self._sessions
+
+    async def start(self, host="127.0.0.1", port=8888, path=None, sock=None):
+        """Starts accepting connections.
+
+        Args:
+            host: The address to listen on.
+            port: The TCP port to listen on. 0 picks a free port.
+            path: If given, listen on this Unix socket instead of TCP.
+            sock: If given, accept connections on this already bound socket.
+
+        Returns:
+            The asyncio Server.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self._serve_session, path)
+        if sock is not None:
+            return await asyncio.start_server(self._serve_session, sock=sock)
+        return await asyncio.start_server(self._serve_session, host, port)
+
+    async def _serve_session(self, reader, writer):
+        self._sessions += 1
+        try:
+            await self._run_session(reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            self._sessions -= 1
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _run_session(self, reader, writer):
+        output = OutputSink(_WriterStream(writer), autoflush=False)
+        player = VideoPlayer(self._video_library, output=output,
+                             defer_prompts=True, page_size=self._page_size)
+        parser = CommandParser(player, self._stats)
+        output.write_line(GREETING)
+        output.flush()
+        while True:
+            if not player.awaiting_answer:
+                writer.write(PROMPT.encode("utf-8"))
+            await writer.drain()
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # The rest of the line would be read as further commands.
+                output.write_line(LINE_TOO_LONG)
+                output.flush()
+                await writer.drain()
+                return
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").rstrip("\r\n")
+            if player.awaiting_answer:
+                player.answer_search_prompt(command)
+                continue
+            if command.upper() == "EXIT":
+                break
+            try:
+                parser.execute_command(command.split())
+            except CommandException as e:
+                output.write_line(str(e))
+                output.flush()
+        output.write_line(FAREWELL)
+        output.flush()
+        await writer.drain()
+
+
+async def _serve_forever(video_library, host, port, path, stats, page_size):
+    server = await VideoServer(video_library, stats, page_size).start(
+        host, port, path)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    add_library_arguments(arg_parser)
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8888)
+    arg_parser.add_argument("--unix", metavar="PATH",
+                            help="listen on a Unix socket instead of TCP")
+    arg_parser.add_argument(
+        "--stats", action="store_true",
+        help="record how long each command takes, shown by the STATS command")
+    add_page_size_argument(arg_parser)
+    args = arg_parser.parse_args()
+    try:
+        asyncio.run(_serve_forever(
+            open_library(args), args.host, args.port, args.unix,
+            CommandStats() if args.stats else None, args.page_size or None))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,105 @@
+"""Generates synthetic video catalogs of any size for benchmarking."""
+
+import argparse
+import itertools
+import random
+
+_SYLLABLES = (
+    "ba", "ca", "da", "fa", "ga", "ha", "ka", "la", "ma", "na", "pa", "ra",
+    "sa", "ta", "va", "be", "de", "fe", "ge", "le", "me", "ne", "pe", "re",
+    "se", "te", "bi", "di", "fi", "gi", "ki", "li", "mi", "ni", "pi", "ri",
+    "si", "ti", "bo", "co", "do", "go", "lo", "mo", "no", "po", "ro", "so",
+    "to", "bu", "du", "gu", "lu", "mu", "nu", "pu", "ru", "su", "tu",
+)
+
+
+def _vocabulary(rng, size, min_syllables, max_syllables):
+    """Returns size distinct made-up words."""
+    words = {}
+    while len(words) < size:
+        word = "".join(rng.choices(
+            _SYLLABLES, k=rng.randint(min_syllables, max_syllables)))
+        words[word] = None
+    return list(words)
+
+
+def _zipf_weights(size):
+    """Returns cumulative weights making the i-th item 1/(i+1) as likely as
+    the first, the way word and tag popularity falls off."""
+    return list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+class SyntheticCatalog:
+    """A class used to describe a generated catalog: its size, and the words
+    and tags its titles and videos are drawn from, most popular first."""
+
+    def __init__(self, count, seed=0, words=20000, tags=2000):
+        """The SyntheticCatalog class is initialized.
+
+        Args:
+            count: The number of videos.
+            seed: The seed the catalog is generated from. The same seed
+                always gives the same catalog.
+            words: The size of the title vocabulary.
+            tags: The number of distinct tags.
+        """
+        self._count = count
+        self._seed = seed
+        rng = random.Random(seed)
+        self._words = _vocabulary(rng, words, 1, 4)
+        self._tags = ["#" + tag for tag in _vocabulary(rng, tags, 2, 3)]
+        self._word_weights = _zipf_weights(words)
+        self._tag_weights = _zipf_weights(tags)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def words(self):
+        return self._words
+
+    @property
+    def tags(self):
+        return self._tags
+
+    @staticmethod
+    def video_id(index):
+        """Returns the id of the index-th video."""
+        return "video_{0:x}".format(index)
+
+    def records(self):
+        """Yields the (title, video_id, tags) of every video.
+
+        Titles are three to ten words long and videos carry up to five
+        tags, both drawn with a Zipf distribution so that a few words and
+        tags are very common and most are rare.
+        """
+        rng = random.Random(self._seed + 1)
+        for index in range(self._count):
+            title = " ".join(rng.choices(
+                self._words, cum_weights=self._word_weights,
+                k=rng.randint(3, 10))).capitalize()
+            tags = dict.fromkeys(rng.choices(
+                self._tags, cum_weights=self._tag_weights, k=rng.randint(0, 5)))
+            yield title, self.video_id(index), list(tags)
+
+    def write(self, path):
+        """Writes the catalog in the videos.txt format.
+
+        Args:
+            path: The path of the catalog file to write.
+        """
+        with open(path, "w", encoding="utf-8") as catalog_file:
+            for title, video_id, tags in self.records():
+                catalog_file.write("{0} | {1} | {2}\n".format(
+                    title, video_id, " , ".join(tags)))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("count", type=int, help="number of videos")
+    arg_parser.add_argument("output", help="path of the catalog to write")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    SyntheticCatalog(args.count, args.seed).write(args.output)
@@ -0,0 +1,225 @@
+"""A ranked full-text title index class."""
+
+import bisect
+import collections
+import heapq
+import itertools
+import math
+import operator
+import re
+
+_TOKEN = re.compile(r"\w+")
+
+# BM25 parameters: how quickly repeating a word stops adding to the score,
+# and how much longer titles are penalized.
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text):
+    """Returns the lower case words of text."""
+    return _TOKEN.findall(text.lower())
+
+
+def parse_query(query):
+    """Parses a ranked search query.
+
+    Words must all match, unless separated by OR. A word ending in * matches
+    any word starting with it.
+
+    Args:
+        query: The query, such as "funny cat* OR dog".
+
+    Returns:
+        A list of alternatives, each a list of (word, is_prefix) tuples that
+        must all match.
+    """
+    alternatives = [[]]
+    for word in query.split():
+        if word == "OR":
+            alternatives.append([])
+            continue
+        if word == "AND":
+            continue
+        tokens = tokenize(word)
+        if not tokens:
+            continue
+        alternatives[-1].extend((token, False) for token in tokens[:-1])
+        alternatives[-1].append((tokens[-1], word.endswith("*")))
+    return [terms for terms in alternatives if terms]
+
+
+class TitleIndex:
+    """A class used to rank titles against word queries with BM25.
+
+    Titles are split into words. A word's score in a title only depends on
+    how often it occurs there and how long the title is, so each word maps
+    those (frequency, length) pairs to the keys of the titles they describe,
+    and every key in such a bucket shares one score. Titles can be added and
+    removed one at a time.
+    """
+
+    def __init__(self):
+        # Maps a word to a dict of (frequency, title length) buckets, each the
+        # set of keys whose titles contain the word that often and are that
+        # long.
+        self._postings = {}
+        # Maps a word to the number of titles containing it.
+        self._title_counts = {}
+        self._count = 0
+        self._total_length = 0
+        # All words in sorted order, for prefix matching. Rebuilt on first use
+        # after a word is added or removed.
+        self._sorted_words = None
+
+    def __len__(self):
+        return self._count
+
+    def add(self, key, title):
+        """Indexes a title.
+
+        Args:
+            key: What search() returns for the title, such as a video id.
+            title: The title to index.
+        """
+        tokens = tokenize(title)
+        length = len(tokens)
+        self._count += 1
+        self._total_length += length
+        postings = self._postings
+        title_counts = self._title_counts
+        for token, frequency in collections.Counter(tokens).items():
+            buckets = postings.get(token)
+            if buckets is None:
+                buckets = postings[token] = {}
+                title_counts[token] = 0
+                self._sorted_words = None
+            bucket = buckets.get((frequency, length))
+            if bucket is None:
+                bucket = buckets[frequency, length] = set()
+            bucket.add(key)
+            title_counts[token] += 1
+
+    def remove(self, key, title):
+        """Removes a title added with add().
+
+        Args:
+            key: The key the title was added with.
+            title: The title it was added with.
+        """
+        tokens = tokenize(title)
+        self._count -= 1
+        self._total_length -= len(tokens)
+        for token, frequency in collections.Counter(tokens).items():
+            buckets = self._postings[token]
+            bucket = buckets[frequency, len(tokens)]
+            bucket.discard(key)
+            if not bucket:
+                del buckets[frequency, len(tokens)]
+            self._title_counts[token] -= 1
+            if not buckets:
+                del self._postings[token]
+                del self._title_counts[token]
+                self._sorted_words = None
+
+    def _expand(self, word, is_prefix):
+        """Returns the indexed words a query word matches."""
+        if not is_prefix:
+            return [word] if word in self._postings else []
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self._postings)
+        words = []
+        start = bisect.bisect_left(self._sorted_words, word)
+        for indexed in self._sorted_words[start:]:
+            if not indexed.startswith(word):
+                break
+            words.append(indexed)
+        return words
+
+    def _keys(self, words):
+        """Returns the set of keys whose titles contain any of words."""
+        keys = set()
+        for word in words:
+            for bucket in self._postings[word].values():
+                keys |= bucket
+        return keys
+
+    def _scored_buckets(self, word):
+        """Yields the BM25 score of each of a word's buckets, and its keys."""
+        title_count = self._title_counts[word]
+        idf = math.log(1 + (self._count - title_count + 0.5) / (title_count + 0.5))
+        # The length normalization of a title, _K1 * (1 - _B + _B * length /
+        # average length), is base + slope * length.
+        base = _K1 * (1 - _B)
+        slope = _K1 * _B * self._count / self._total_length
+        for (frequency, length), keys in self._postings[word].items():
+            yield idf * (_K1 + 1) * frequency / (
+                frequency + base + slope * length), keys
+
+    def _best_of_word(self, word, rank, accept, limit):
+        """Returns the keys of the best titles containing one word, opening
+        only as many buckets as it takes to fill limit."""
+        buckets = sorted(self._scored_buckets(word), key=operator.itemgetter(0),
+                         reverse=True)
+        results = []
+        for _, tied in itertools.groupby(buckets, key=operator.itemgetter(0)):
+            keys = [key for _, bucket in tied for key in bucket]
+            if accept is not None:
+                keys = list(filter(accept, keys))
+            if limit is None or len(results) + len(keys) <= limit:
+                results.extend(sorted(keys, key=rank))
+            else:
+                results.extend(heapq.nsmallest(limit - len(results), keys, key=rank))
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def search(self, query, rank, accept=None, limit=None):
+        """Returns the keys of the titles matching a query, best first.
+
+        Args:
+            query: The query, as parse_query() accepts it.
+            rank: Called with a key to break ties between equal scores,
+                lower first.
+            accept: If given, only keys for which it returns true are
+                returned.
+            limit: If given, only the best limit keys are returned, without
+                sorting every match.
+
+        Returns:
+            A list of keys. Empty if no title matches.
+        """
+        alternatives = parse_query(query)
+        if len(alternatives) == 1 and len(alternatives[0]) == 1:
+            words = self._expand(*alternatives[0][0])
+            if len(words) == 1:
+                return self._best_of_word(words[0], rank, accept, limit)
+        matches = set()
+        all_words = set()
+        for terms in alternatives:
+            matching = None
+            for word, is_prefix in terms:
+                words = self._expand(word, is_prefix)
+                all_words.update(words)
+                keys = self._keys(words)
+                matching = keys if matching is None else matching & keys
+                if not matching:
+                    break
+            matches |= matching
+        if accept is not None:
+            matches = set(filter(accept, matches))
+        # Add up each word's score, one bucket at a time.
+        scores = dict.fromkeys(matches, 0.0)
+        for word in all_words:
+            for score, keys in self._scored_buckets(word):
+                for key in keys & matches if len(keys) > len(matches) else keys:
+                    if key in scores:
+                        scores[key] += score
+        if limit is not None and limit < len(scores):
+            # Only titles scoring at least the limit-th best score can make
+            # the cut. Finding that score only compares floats.
+            threshold = heapq.nlargest(limit, scores.values())[-1]
+            best = [key for key, score in scores.items() if score >= threshold]
+            return heapq.nsmallest(
+                limit, best, key=lambda key: (-scores[key], rank(key)))
+        return sorted(scores, key=lambda key: (-scores[key], rank(key)))
@@ -1,11 +1,15 @@
 """A video class."""
 
 from typing import Sequence
+import sys
 
 
 class Video:
     """A class used to represent a Video."""
 
+    # Catalogs hold a great many videos, so avoid a __dict__ per instance.
+    __slots__ = ("_title", "_video_id", "_flagged", "_flagged_reason", "_tags")
+
     def __init__(self, video_title: str, video_id: str, video_tags: Sequence[str]):
         """Video constructor."""
         self._title = video_title
@@ -14,8 +18,10 @@ class Video:
         self._flagged_reason = ""
 
         # Turn the tags into a tuple here so it's unmodifiable,
-        # in case the caller changes the 'video_tags' they passed to us
-        self._tags = tuple(video_tags)
+        # in case the caller changes the 'video_tags' they passed to us.
+        # The same tags recur across many videos, so intern them to keep
+        # a single copy of each.
+        self._tags = tuple(map(sys.intern, video_tags))
 
     @property
     def title(self) -> str:
@@ -48,11 +54,13 @@ class Video:
         
         Args:
             reason: The reason for flagging the video"""
-        self._flagged = True
+        # Set the reason first so that readers on other threads never see the
+        # video flagged with a stale reason.
         if reason:
             self._flagged_reason = reason
         else:
             self._flagged_reason = "Not supplied"
+        self._flagged = True
 
     def unflag(self):
         """Removes the flag from a video"""
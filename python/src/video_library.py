@@ -1,8 +1,19 @@
 """A video library class."""
 
+from .flag_store import restore_flags
+from .search_cache import SearchCache
+from .title_index import TitleIndex
 from .video import Video
 from pathlib import Path
 import csv
+import functools
+import heapq
+import itertools
+import random
+import threading
+
+
+DEFAULT_CATALOG_PATH = Path(__file__).parent / "videos.txt"
 
 
 # Helper Wrapper around CSV reader to strip whitespace from around
@@ -11,26 +22,528 @@ def _csv_reader_with_strip(reader):
     yield from ((item.strip() for item in line) for line in reader)
 
 
+def _read_records(lines):
+    """Yields a (title, video_id, tags) tuple for each record of a
+    pipe-delimited catalog.
+
+    Args:
+        lines: An iterable of catalog lines in title | id | tags format.
+    """
+    reader = _csv_reader_with_strip(csv.reader(lines, delimiter="|"))
+    for video_info in reader:
+        title, url, tags = video_info
+        yield (
+            title,
+            url,
+            [tag.strip() for tag in tags.split(",")] if tags else [],
+        )
+
+
+def _read_catalog(lines):
+    """Yields a Video for each record of a pipe-delimited catalog.
+
+    Args:
+        lines: An iterable of catalog lines in title | id | tags format.
+    """
+    for title, url, tags in _read_records(lines):
+        yield Video(title, url, tags)
+
+
+def _insort_by_title(videos, video):
+    """Inserts video into a title-sorted list of videos, after any videos with
+    an equal title so that insertion order is kept for ties.
+
+    Args:
+        videos: A list of video objects sorted by title.
+        video: The video object to insert.
+
+    Returns:
+        The position the video was inserted at.
+    """
+    lo, hi = 0, len(videos)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if video.title < videos[mid].title:
+            hi = mid
+        else:
+            lo = mid + 1
+    videos.insert(lo, video)
+    return lo
+
+
+def _remove_by_title(videos, video):
+    """Removes video from a title-sorted list of videos.
+
+    Args:
+        videos: A list of video objects sorted by title.
+        video: The video object to remove. Must be in the list.
+    """
+    lo, hi = 0, len(videos)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if videos[mid].title < video.title:
+            lo = mid + 1
+        else:
+            hi = mid
+    while videos[lo] is not video:
+        lo += 1
+    del videos[lo]
+
+
+# The distance between the title ranks of neighbouring videos after the
+# ranks are assigned afresh. A video inserted between two others takes the
+# rank halfway between theirs, so this many bits of room allow that many
+# insertions at one spot before the ranks have to be reassigned.
+_RANK_GAP = 1 << 32
+
+
+def _trigrams(text):
+    """Returns the set of three character substrings of text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
 class VideoLibrary:
-    """A class used to represent a Video Library."""
+    """A class used to represent a Video Library.
+
+    A library can be shared by several players, including players on other
+    threads. Its catalog, indexes and the flag state of its videos are
+    guarded by a lock, and flags should be changed through flag_video() and
+    allow_video() rather than on the videos directly.
+    """
+
+    def __init__(self, catalog_path=None, lazy=False, search_cache_size=1024):
+        """The VideoLibrary class is initialized.
 
-    def __init__(self):
-        """The VideoLibrary class is initialized."""
+        Args:
+            catalog_path: Path of the catalog to load. Defaults to the bundled
+                videos.txt.
+            lazy: If true, nothing is read up front. Records are parsed the
+                first time they are looked up, seeking straight to them
+                through an index of file offsets, and the whole catalog is
+                only loaded once a listing or search needs it.
+            search_cache_size: How many searches to keep the unflagged
+                results of. 0 disables the cache.
+        """
+        self._catalog_path = Path(catalog_path or DEFAULT_CATALOG_PATH)
         self._videos = {}
-        with open(Path(__file__).parent / "videos.txt") as video_file:
-            reader = _csv_reader_with_strip(
-                csv.reader(video_file, delimiter="|"))
-            for video_info in reader:
-                title, url, tags = video_info
-                self._videos[url] = Video(
-                    title,
-                    url,
-                    [tag.strip() for tag in tags.split(",")] if tags else [],
-                )
+        self._loaded = False
+        # Maps a video id to the byte offset of its record. Only used while a
+        # lazy library has not been fully loaded yet.
+        self._offsets = None
+        # Maps a lower case tag to the videos carrying it, sorted by title.
+        self._tag_index = {}
+        # Lower case title of every video, used to verify index candidates.
+        self._titles_nocase = {}
+        # Maps each trigram of a lower case title to the ids of the videos
+        # whose titles contain it. Titles shorter than a trigram are kept
+        # apart since they cannot be reached through the index.
+        self._trigram_index = {}
+        self._short_titles = set()
+        # Ranks titles against word queries for search_titles_ranked(). Built
+        # on the first ranked search and kept up to date from then on.
+        self._ranked_index = None
+        # All videos sorted by title, ties kept in insertion order, and a
+        # rank for each video id that sorts the same way. Ranks are spaced
+        # out so that an added video can be given one between its
+        # neighbours' without renumbering the others.
+        self._title_order = []
+        self._title_ranks = {}
+        # The unflagged videos, in no particular order, and the position of
+        # each of their ids in that list, so that a random unflagged video
+        # can be picked and videos added or removed in constant time.
+        self._unflagged = []
+        self._unflagged_positions = {}
+        # Reentrant since methods such as get_videos call other locked ones.
+        self._lock = threading.RLock()
+        # If set, the FlagStore every flag change is recorded to.
+        self._flag_store = None
+        # Unflagged results of recent searches, keyed by ("title", term) or
+        # ("tag", tag) in lower case.
+        self._search_cache = SearchCache(search_cache_size)
+        if not lazy:
+            self._load_all()
+
+    def _load_all(self):
+        """Parses the whole catalog and builds the search indexes. Videos
+        already parsed by a lazy lookup are kept, so their state is preserved.
+        """
+        parsed = self._videos
+        self._videos = {}
+        with open(self._catalog_path, encoding="utf-8") as video_file:
+            for video in _read_catalog(video_file):
+                self._videos[video.video_id] = parsed.get(video.video_id, video)
+        self._offsets = None
+        self._loaded = True
+        self._build_indexes()
+        self._search_cache.clear()
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._load_all()
+
+    def _ensure_offsets(self):
+        """Returns the video id to record offset index, scanning the catalog
+        for it on first use."""
+        if self._offsets is None:
+            offsets = {}
+            offset = 0
+            with open(self._catalog_path, "rb") as video_file:
+                for line in video_file:
+                    fields = line.split(b"|")
+                    if len(fields) == 3:
+                        offsets[fields[1].strip().decode("utf-8")] = offset
+                    offset += len(line)
+            self._offsets = offsets
+        return self._offsets
+
+    def _read_video_at(self, offset):
+        """Parses the catalog record starting at a byte offset."""
+        with open(self._catalog_path, "rb") as video_file:
+            video_file.seek(offset)
+            line = video_file.readline().decode("utf-8")
+        return next(_read_catalog([line]))
+
+    def _build_indexes(self):
+        """Builds the search indexes from scratch for all loaded videos."""
+        self._tag_index = {}
+        self._titles_nocase = {}
+        self._trigram_index = {}
+        self._short_titles = set()
+        self._ranked_index = None
+        # sort() is stable, so videos with equal titles keep library order.
+        self._title_order = sorted(self._videos.values(), key=lambda v: v.title)
+        self._assign_title_ranks()
+        self._unflagged = []
+        self._unflagged_positions = {}
+        # Walking the videos in title order keeps every posting list sorted.
+        for video in self._title_order:
+            for tag in self._video_tags_nocase(video):
+                self._tag_index.setdefault(tag, []).append(video)
+            self._index_title(video)
+            if not video.flagged:
+                self._add_unflagged(video)
+
+    @staticmethod
+    def _video_tags_nocase(video):
+        """Returns the distinct lower case tags of a video."""
+        return {tag.lower() for tag in video.tags}
+
+    def _index_title(self, video):
+        video_id = video.video_id
+        title_nocase = video.title.lower()
+        self._titles_nocase[video_id] = title_nocase
+        if len(title_nocase) < 3:
+            self._short_titles.add(video_id)
+        for gram in _trigrams(title_nocase):
+            self._trigram_index.setdefault(gram, set()).add(video_id)
+        if self._ranked_index is not None:
+            self._ranked_index.add(video_id, title_nocase)
+
+    def _unindex_title(self, video):
+        video_id = video.video_id
+        title_nocase = self._titles_nocase.pop(video_id)
+        self._short_titles.discard(video_id)
+        for gram in _trigrams(title_nocase):
+            postings = self._trigram_index[gram]
+            postings.discard(video_id)
+            if not postings:
+                del self._trigram_index[gram]
+        if self._ranked_index is not None:
+            self._ranked_index.remove(video_id, title_nocase)
+
+    def _index_video(self, video):
+        for tag in self._video_tags_nocase(video):
+            _insort_by_title(self._tag_index.setdefault(tag, []), video)
+        self._index_title(video)
+        self._rank_title(_insort_by_title(self._title_order, video))
+        if not video.flagged:
+            self._add_unflagged(video)
+
+    def _unindex_video(self, video):
+        for tag in self._video_tags_nocase(video):
+            postings = self._tag_index[tag]
+            _remove_by_title(postings, video)
+            if not postings:
+                del self._tag_index[tag]
+        self._unindex_title(video)
+        _remove_by_title(self._title_order, video)
+        del self._title_ranks[video.video_id]
+        self._discard_unflagged(video.video_id)
+
+    def _add_unflagged(self, video):
+        self._unflagged_positions[video.video_id] = len(self._unflagged)
+        self._unflagged.append(video)
+
+    def _discard_unflagged(self, video_id):
+        position = self._unflagged_positions.pop(video_id, None)
+        if position is None:
+            return
+        # Move the last video into the freed slot.
+        last = self._unflagged.pop()
+        if position < len(self._unflagged):
+            self._unflagged[position] = last
+            self._unflagged_positions[last.video_id] = position
+
+    def _invalidate_searches(self, video):
+        """Drops the cached searches that a video matches, once its
+        visibility in them changes."""
+        title_nocase = video.title.lower()
+        tags_nocase = self._video_tags_nocase(video)
+        self._search_cache.invalidate(
+            lambda key: key[1] in (title_nocase if key[0] == "title"
+                                   else tags_nocase))
+
+    def _unflagged_results(self, key, limit, search):
+        """Returns the first limit unflagged results of a search, from the
+        cache if possible.
+
+        Args:
+            key: The cache key of the search.
+            limit: How many results are needed. None for all of them.
+            search: Called with include_flagged and limit to run the search.
+        """
+        results = self._search_cache.get(key, limit)
+        if results is None:
+            results = search(False, limit)
+            self._search_cache.put(
+                key, results, limit is None or len(results) < limit)
+            results = list(results)
+        return results
+
+    def _tag_matches(self, tag_nocase, include_flagged, limit):
+        videos = self._tag_index.get(tag_nocase, ())
+        if not include_flagged:
+            videos = (video for video in videos if not video.flagged)
+        return list(itertools.islice(videos, limit))
+
+    def _title_matches(self, term_nocase, include_flagged, limit):
+        titles_nocase = self._titles_nocase
+        if limit is not None and self._is_common(term_nocase):
+            # Common terms have many candidates to gather and check, while
+            # walking the titles in order finds the first few matches soon.
+            videos = (video for video in self._title_order
+                      if term_nocase in titles_nocase[video.video_id]
+                      and (include_flagged or not video.flagged))
+            return list(itertools.islice(videos, limit))
+        videos = self._videos
+        matches = (video_id for video_id in self._title_candidates(term_nocase)
+                   if term_nocase in titles_nocase[video_id])
+        if not include_flagged:
+            matches = (video_id for video_id in matches
+                       if not videos[video_id].flagged)
+        rank = self._title_ranks.__getitem__
+        if limit is None:
+            matches = sorted(matches, key=rank)
+        else:
+            matches = heapq.nsmallest(limit, matches, key=rank)
+        return [videos[video_id] for video_id in matches]
+
+    def _get_ranked_index(self):
+        """Returns the TitleIndex of all titles, building it on first use."""
+        if self._ranked_index is None:
+            ranked_index = TitleIndex()
+            for video_id, title_nocase in self._titles_nocase.items():
+                ranked_index.add(video_id, title_nocase)
+            self._ranked_index = ranked_index
+        return self._ranked_index
+
+    def _is_common(self, term_nocase):
+        """Returns true if term_nocase may occur in more than an eighth of
+        the titles. Terms shorter than a trigram are always deemed common,
+        since finding their candidates means a pass over the trigram index.
+        """
+        if len(term_nocase) < 3:
+            return True
+        rarest = min(len(self._trigram_index.get(gram, ()))
+                     for gram in _trigrams(term_nocase))
+        return rarest * 8 > len(self._videos)
+
+    def _assign_title_ranks(self):
+        """Ranks every video afresh from its position in title order."""
+        self._title_ranks = {video.video_id: position * _RANK_GAP
+                             for position, video in enumerate(self._title_order)}
+
+    def _rank_title(self, position):
+        """Ranks the video just inserted into the title order at position
+        between its neighbours, reassigning every rank if they have no room
+        left between them."""
+        order = self._title_order
+        ranks = self._title_ranks
+        if len(order) == 1:
+            ranks[order[0].video_id] = 0
+            return
+        if position == 0:
+            high = ranks[order[1].video_id]
+            low = high - 2 * _RANK_GAP
+        else:
+            low = ranks[order[position - 1].video_id]
+            high = (ranks[order[position + 1].video_id]
+                    if position + 1 < len(order) else low + 2 * _RANK_GAP)
+        if high - low < 2:
+            self._assign_title_ranks()
+        else:
+            ranks[order[position].video_id] = (low + high) // 2
+
+    def _title_candidates(self, term_nocase):
+        """Returns the ids of videos whose titles may contain term_nocase."""
+        if len(term_nocase) >= 3:
+            postings = []
+            for gram in _trigrams(term_nocase):
+                ids = self._trigram_index.get(gram)
+                if not ids:
+                    return set()
+                postings.append(ids)
+            postings.sort(key=len)
+            return postings[0].intersection(*postings[1:])
+        if not term_nocase:
+            return set(self._titles_nocase)
+        # Shorter terms can only be found inside the trigrams that contain
+        # them, or in titles too short to have been indexed.
+        candidates = set(self._short_titles)
+        for gram, ids in self._trigram_index.items():
+            if term_nocase in gram:
+                candidates.update(ids)
+        return candidates
+
+    def __len__(self):
+        with self._lock:
+            if self._loaded:
+                return len(self._videos)
+            return len(self._ensure_offsets())
+
+    def add_video(self, video):
+        """Adds a video to the library, replacing any video with the same id.
+
+        Args:
+            video: The video object to be added.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            existing = self._videos.get(video.video_id)
+            if existing is not None:
+                self._unindex_video(existing)
+                self._invalidate_searches(existing)
+            self._videos[video.video_id] = video
+            self._index_video(video)
+            self._invalidate_searches(video)
+
+    def remove_video(self, video_id):
+        """Removes a video from the library.
+
+        Args:
+            video_id: The video url.
+
+        Returns:
+            The removed Video object. None if the video does not exist.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            video = self._videos.pop(video_id, None)
+            if video is not None:
+                self._unindex_video(video)
+                self._invalidate_searches(video)
+            return video
+
+    def flag_video(self, video, reason):
+        """Flags a video so it is no longer picked at random. If the flag
+        cannot be recorded to the FlagStore, its OSError is raised and the
+        video is left unflagged.
+
+        Args:
+            video: The video object to be flagged.
+            reason: The reason for flagging the video.
+
+        Returns:
+            True if the video was flagged, False if it already was.
+        """
+        with self._lock:
+            if video.flagged:
+                return False
+            video.flag(reason)
+            if self._flag_store is not None:
+                try:
+                    self._flag_store.record_flag(
+                        video.video_id, video.flagged_reason)
+                except OSError:
+                    video.unflag()
+                    raise
+            if self._loaded:
+                self._discard_unflagged(video.video_id)
+            self._invalidate_searches(video)
+            return True
+
+    def allow_video(self, video):
+        """Removes the flag from a video so it can be picked at random again.
+        If the change cannot be recorded to the FlagStore, its OSError is
+        raised and the video is left flagged.
+
+        Args:
+            video: The video object to be allowed.
+
+        Returns:
+            True if the flag was removed, False if the video was not flagged.
+        """
+        with self._lock:
+            if not video.flagged:
+                return False
+            reason = video.flagged_reason
+            video.unflag()
+            if self._flag_store is not None:
+                try:
+                    self._flag_store.record_allow(video.video_id)
+                except OSError:
+                    video.flag(reason)
+                    raise
+            if (self._loaded and self._videos.get(video.video_id) is video
+                    and video.video_id not in self._unflagged_positions):
+                self._add_unflagged(video)
+            self._invalidate_searches(video)
+            return True
+
+    def persist_flags(self, flag_store):
+        """Restores the flags kept in a FlagStore and records every later
+        flag change to it.
+
+        Args:
+            flag_store: The FlagStore to restore from and record to.
+        """
+        with self._lock:
+            self._flag_store = None
+            restore_flags(self, flag_store)
+            self._flag_store = flag_store
+
+    def get_random_video(self, rng=random):
+        """Returns a random unflagged video, all being equally likely.
+
+        Args:
+            rng: The random number generator to use. Defaults to the random
+                module.
+
+        Returns:
+            A Video object. None if every video is flagged.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            unflagged = self._unflagged
+            while unflagged:
+                video = unflagged[rng.randrange(len(unflagged))]
+                if not video.flagged:
+                    return video
+                # Flagged directly on the video rather than through flag_video.
+                self._discard_unflagged(video.video_id)
+            return None
 
     def get_all_videos(self):
         """Returns all available video information from the video library."""
-        return list(self._videos.values())
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._videos.values())
+
+    def get_videos_by_title(self):
+        """Returns all videos in the video library, sorted by title."""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._title_order)
 
     def get_video(self, video_id):
         """Returns the video object (title, url, tags) from the video library.
@@ -42,4 +555,104 @@ class VideoLibrary:
             The Video object for the requested video_id. None if the video
             does not exist.
         """
-        return self._videos.get(video_id, None)
+        with self._lock:
+            video = self._videos.get(video_id, None)
+            if video is None and not self._loaded:
+                offset = self._ensure_offsets().get(video_id)
+                if offset is not None:
+                    video = self._read_video_at(offset)
+                    self._videos[video_id] = video
+            return video
+
+    def get_videos(self, video_ids):
+        """Returns the video objects for several video ids in one call.
+
+        Args:
+            video_ids: An iterable of video urls.
+
+        Returns:
+            A list with the Video object for each requested video_id, in the
+            same order. None in place of any video that does not exist.
+        """
+        with self._lock:
+            if not self._loaded:
+                return list(map(self.get_video, video_ids))
+            return list(map(self._videos.get, video_ids))
+
+    @property
+    def search_cache(self):
+        """Returns the SearchCache holding recent unflagged search results."""
+        return self._search_cache
+
+    def get_videos_with_tag(self, video_tag, include_flagged=True,
+                            limit=None):
+        """Returns the videos carrying a tag, sorted by title.
+
+        Args:
+            video_tag: The tag to look up (case insensitive).
+            include_flagged: If false, flagged videos are left out and the
+                results are cached.
+            limit: If given, only the first limit videos are returned, and
+                only as many are looked at as it takes to find them.
+
+        Returns:
+            A list of Video objects. Empty if no video carries the tag.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            tag_nocase = video_tag.lower()
+            if not include_flagged:
+                return self._unflagged_results(
+                    ("tag", tag_nocase), limit,
+                    functools.partial(self._tag_matches, tag_nocase))
+            return self._tag_matches(tag_nocase, True, limit)
+
+    def search_titles(self, search_term, include_flagged=True, limit=None):
+        """Returns the videos whose titles contain a search term, sorted by
+        title.
+
+        Args:
+            search_term: The substring to look for (case insensitive).
+            include_flagged: If false, flagged videos are left out and the
+                results are cached.
+            limit: If given, only the first limit videos are returned. They
+                are picked with a heap or by walking the titles in order
+                rather than by sorting every match.
+
+        Returns:
+            A list of Video objects. Empty if no title matches.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            term_nocase = search_term.lower()
+            if not include_flagged:
+                return self._unflagged_results(
+                    ("title", term_nocase), limit,
+                    functools.partial(self._title_matches, term_nocase))
+            return self._title_matches(term_nocase, True, limit)
+
+    def search_titles_ranked(self, query, include_flagged=True, limit=None):
+        """Returns the videos whose titles best match a word query, best
+        first. Titles are scored with BM25, and equal scores are sorted by
+        title.
+
+        Args:
+            query: The words to look for (case insensitive). Every word must
+                be in the title, unless words are separated by OR. A word
+                ending in * matches any word starting with it.
+            include_flagged: If false, flagged videos are left out.
+            limit: If given, only the best limit videos are returned.
+
+        Returns:
+            A list of Video objects. Empty if no title matches.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            videos = self._videos
+            accept = None
+            if not include_flagged:
+                def accept(video_id):
+                    return not videos[video_id].flagged
+            matches = self._get_ranked_index().search(
+                query, self._title_ranks.__getitem__, accept, limit)
+            return [videos[video_id] for video_id in matches]
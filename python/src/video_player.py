@@ -2,38 +2,103 @@
 
 from .video_library import VideoLibrary
 from .video_playlist import Playlist
+from .output_sink import OutputSink
+import bisect
+import functools
 import random
 
 
-class VideoPlayer:
-    """A class used to represent a Video Player."""
+def _command(method):
+    """Decorates a VideoPlayer command so that its output is flushed once the
+    command returns."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._output.command():
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
-    def __init__(self):
-        self._video_library = VideoLibrary()
+class VideoPlayer:
+    """A class used to represent a Video Player.
+
+    A player holds the state of one user session: what is playing, its
+    playlists and pending search results. The video library, including flag
+    state, may be shared with other players.
+    """
+
+    def __init__(self, video_library=None, rng=random, output=None,
+                 input_fn=None, defer_prompts=False, playlist_store=None,
+                 page_size=20):
+        if video_library is None:
+            video_library = VideoLibrary()
+        self._video_library = video_library
+        # Source of randomness for PLAY_RANDOM. Pass a seeded random.Random
+        # for reproducible runs.
+        self._rng = rng
+        if output is None:
+            output = OutputSink()
+        self._output = output
+        # Reads the answer to the search prompt. None means the built-in
+        # input().
+        self._input = input_fn
+        # If true, the search prompt does not wait for an answer. The results
+        # are kept until answer_search_prompt() is called instead.
+        self._defer_prompts = defer_prompts
+        # The results shown by a deferred prompt and the offset of the first.
+        self._pending_results = None
+        # How many search results are shown at a time. None shows them all.
+        self._page_size = page_size
+        # The kind ("title", "ranked" or "tag"), term and offset of the last
+        # page of search results shown, for NEXT and PREV.
+        self._last_search = None
         self.playing = None
         self.paused = True
-        self.playlists = []
-
+        # Playlists keyed by lower case name, plus their keys in sorted order
+        # so they can be listed without sorting.
+        self._playlists = {}
+        self._playlist_order = []
+        # If given, a PlaylistStore that playlist changes are journalled to
+        # and that the playlists are recovered from.
+        self._playlist_store = playlist_store
+        if playlist_store is not None:
+            self._restore_playlists()
+
+    def _restore_playlists(self):
+        for name, video_ids in self._playlist_store.playlists:
+            playlist = Playlist(name)
+            playlist.add_videos(
+                video for video in self._video_library.get_videos(video_ids)
+                if video is not None)
+            self._playlists[playlist.name_nocase] = playlist
+            bisect.insort(self._playlist_order, playlist.name_nocase)
+
+    def _record(self, operation, playlist, *video_ids):
+        if self._playlist_store is not None:
+            self._playlist_store.record(operation, playlist.name, *video_ids)
+
+    @property
+    def playlists(self):
+        """Returns all playlists sorted by name (case insensitive)."""
+        return [self._playlists[name] for name in self._playlist_order]
+
+    @property
+    def output(self):
+        """Returns the OutputSink the player writes to."""
+        return self._output
+
+    @_command
     def number_of_videos(self):
-        num_videos = len(self._video_library.get_all_videos())
-        print(f"{num_videos} videos in the library")
+        num_videos = len(self._video_library)
+        self._output.write_line(f"{num_videos} videos in the library")
 
     def prettify_video(self, video):
         """Returns a string representing video. Format is title (id) [#tags]
         
         Args:
             video: the video object to be prettified."""
-        output = "{0} ({1}) [".format(video.title, video.video_id)
-        first = True
-        for tag in video.tags:
-            if first:
-                first = False
-            else:
-                output = output + " "
-            output = output + tag
-        output = output + "]"
+        output = "{0} ({1}) [{2}]".format(video.title, video.video_id, " ".join(video.tags))
         if video.flagged:
-            output = output + " - FLAGGED (reason: {0})".format(video.flagged_reason)
+            return "{0} - FLAGGED (reason: {1})".format(output, video.flagged_reason)
         return output
 
     def find_video(self, video_id):
@@ -41,26 +106,25 @@ class VideoPlayer:
         
         Args:
             video_id: The id of the video to find"""
-        return next((vid for vid in self._video_library.get_all_videos() if vid.video_id == video_id), None)
+        return self._video_library.get_video(video_id)
 
     def find_playlist(self, playlist_name):
         """Finds playlist based on its name. Returns None if no such playlist is found
         
         Args:
             playlist_name: The name of the playlist to find (case insensitive)"""
-        playlist_name_lower = playlist_name.lower()
-        return next((playlist for playlist in self.playlists if playlist.name_nocase == playlist_name_lower), None)
+        return self._playlists.get(playlist_name.lower())
 
+    @_command
     def show_all_videos(self):
         """Returns all videos."""
 
-        print("Here's a list of all available videos:")
-        videos = self._video_library.get_all_videos()
-        videos.sort(key=lambda x: x.title)
-        for video in videos:
-            print("\t {0}".format(self.prettify_video(video)))
+        self._output.write_line("Here's a list of all available videos:")
+        for video in self._video_library.get_videos_by_title():
+            self._output.write_video("\t {0}".format(self.prettify_video(video)), video)
             
 
+    @_command
     def play_video(self, video_id):
         """Plays the respective video.
 
@@ -71,8 +135,9 @@ class VideoPlayer:
         if new_vid:
             self.play_me(new_vid)
         else:
-            print("Cannot play video: Video does not exist")
+            self._output.write_error("Cannot play video: Video does not exist")
 
+    @_command
     def play_me(self, video):
         """Plays a video object
         
@@ -80,67 +145,72 @@ class VideoPlayer:
             video: The video object to be played"""
         if not video.flagged:
             if self.playing:
-                print("Stopping video: {0}".format(self.playing.title))
-            print("Playing video: {0}".format(video.title))
+                self._output.write_line("Stopping video: {0}".format(self.playing.title))
+            self._output.write_line("Playing video: {0}".format(video.title))
             self.paused = False
             self.playing = video
         else:
-            print("Cannot play video: Video is currently flagged (reason: {0})".format(video.flagged_reason))
+            self._output.write_error("Cannot play video: Video is currently flagged (reason: {0})".format(video.flagged_reason))
 
+    @_command
     def stop_video(self):
         """Stops the current video."""
 
         if not self.playing:
-            print("Cannot stop video: No video is currently playing")
+            self._output.write_error("Cannot stop video: No video is currently playing")
         else:
-            print("Stopping video: {0}".format(self.playing.title))
+            self._output.write_line("Stopping video: {0}".format(self.playing.title))
             self.playing = None
 
+    @_command
     def play_random_video(self):
         """Plays a random video from the video library."""
 
-        videos = list(filter(lambda v: not v.flagged, self._video_library.get_all_videos()))
-        if videos:
-            self.play_me(random.choice(videos))
+        video = self._video_library.get_random_video(self._rng)
+        if video:
+            self.play_me(video)
         else:
-            print("No videos available")
+            self._output.write_line("No videos available")
 
+    @_command
     def pause_video(self):
         """Pauses the current video."""
 
         if self.playing:
             if self.paused:
-                print("Video already paused: {0}".format(self.playing.title))
+                self._output.write_line("Video already paused: {0}".format(self.playing.title))
             else:
-                print("Pausing video: {0}".format(self.playing.title))
+                self._output.write_line("Pausing video: {0}".format(self.playing.title))
                 self.paused = True
         else:
-            print("Cannot pause video: No video is currently playing")
+            self._output.write_error("Cannot pause video: No video is currently playing")
 
+    @_command
     def continue_video(self):
         """Resumes playing the current video."""
 
         if self.playing:
             if self.paused:
-                print("Continuing video: {0}".format(self.playing.title))
+                self._output.write_line("Continuing video: {0}".format(self.playing.title))
                 self.paused = False
             else:
-                print("Cannot continue video: Video is not paused")
+                self._output.write_error("Cannot continue video: Video is not paused")
         else:
-            print("Cannot continue video: No video is currently playing")
+            self._output.write_error("Cannot continue video: No video is currently playing")
 
+    @_command
     def show_playing(self):
         """Displays video currently playing."""
 
         if self.playing:
-            print("Currently playing: {0}".format(self.prettify_video(self.playing)), end="")
+            line = "Currently playing: {0}".format(self.prettify_video(self.playing))
             if self.paused:
-                print(" - PAUSED")
-            else:
-                print()
+                line = line + " - PAUSED"
+            self._output.write_video(line, self.playing)
         else:
-            print("No video is currently playing")
+            self._output.write_line("No video is currently playing")
 
+    @_command
     def create_playlist(self, playlist_name):
         """Creates a playlist with a given name.
 
@@ -149,11 +219,15 @@ class VideoPlayer:
         """
         conflicting_playlist = self.find_playlist(playlist_name)
         if conflicting_playlist:
-            print("Cannot create playlist: A playlist with the same name already exists")
+            self._output.write_error("Cannot create playlist: A playlist with the same name already exists")
         else:
-            self.playlists.append(Playlist(playlist_name))
-            print("Successfully created new playlist: {0}".format(playlist_name))
+            playlist = Playlist(playlist_name)
+            self._playlists[playlist.name_nocase] = playlist
+            bisect.insort(self._playlist_order, playlist.name_nocase)
+            self._record("create", playlist)
+            self._output.write_line("Successfully created new playlist: {0}".format(playlist_name))
 
+    @_command
     def add_to_playlist(self, playlist_name, video_id):
         """Adds a video to a playlist with a given name.
 
@@ -168,27 +242,29 @@ class VideoPlayer:
                 if not video.flagged:
                     success = playlist.add_video(video)
                     if success:
-                        print("Added video to {0}: {1}".format(playlist_name, video.title))
+                        self._record("add", playlist, video.video_id)
+                        self._output.write_line("Added video to {0}: {1}".format(playlist_name, video.title))
                     else:
-                        print("Cannot add video to {0}: Video already added".format(playlist_name))
+                        self._output.write_error("Cannot add video to {0}: Video already added".format(playlist_name))
                 else:
-                    print("Cannot add video to {0}: Video is currently flagged (reason: {1})".format(playlist_name, video.flagged_reason))
+                    self._output.write_error("Cannot add video to {0}: Video is currently flagged (reason: {1})".format(playlist_name, video.flagged_reason))
             else:
-                print("Cannot add video to {0}: Video does not exist".format(playlist_name))
+                self._output.write_error("Cannot add video to {0}: Video does not exist".format(playlist_name))
         else:
-            print("Cannot add video to {0}: Playlist does not exist".format(playlist_name))
+            self._output.write_error("Cannot add video to {0}: Playlist does not exist".format(playlist_name))
 
+    @_command
     def show_all_playlists(self):
         """Display all playlists."""
 
-        if self.playlists:
-            print("Showing all playlists:")
-            playlists_sorted = sorted(self.playlists, key=lambda p: p.name_nocase)
-            for playlist in playlists_sorted:
-                print("\t {0}".format(playlist.name))
+        if self._playlists:
+            self._output.write_line("Showing all playlists:")
+            for name in self._playlist_order:
+                self._output.write_line("\t {0}".format(self._playlists[name].name))
         else:
-            print("No playlists exist yet")
+            self._output.write_line("No playlists exist yet")
 
+    @_command
     def show_playlist(self, playlist_name):
         """Display all videos in a playlist with a given name.
 
@@ -197,15 +273,16 @@ class VideoPlayer:
         """
         playlist = self.find_playlist(playlist_name)
         if playlist:
-            print("Showing playlist: {0}".format(playlist_name))
+            self._output.write_line("Showing playlist: {0}".format(playlist_name))
             if playlist.videos:
                 for video in playlist.videos:
-                    print("\t{0}".format(self.prettify_video(video)))
+                    self._output.write_video("\t{0}".format(self.prettify_video(video)), video)
             else:
-                print("\tNo videos here yet")
+                self._output.write_line("\tNo videos here yet")
         else:
-            print("Cannot show playlist {0}: Playlist does not exist".format(playlist_name))
+            self._output.write_error("Cannot show playlist {0}: Playlist does not exist".format(playlist_name))
 
+    @_command
     def remove_from_playlist(self, playlist_name, video_id):
         """Removes a video to a playlist with a given name.
 
@@ -219,14 +296,16 @@ class VideoPlayer:
             if video:
                 success = playlist.remove_video(video)
                 if success:
-                    print("Removed video from {0}: {1}".format(playlist_name, video.title))
+                    self._record("remove", playlist, video.video_id)
+                    self._output.write_line("Removed video from {0}: {1}".format(playlist_name, video.title))
                 else:
-                    print("Cannot remove video from {0}: Video is not in playlist".format(playlist_name))
+                    self._output.write_error("Cannot remove video from {0}: Video is not in playlist".format(playlist_name))
             else:
-                print("Cannot remove video from {0}: Video does not exist".format(playlist_name))
+                self._output.write_error("Cannot remove video from {0}: Video does not exist".format(playlist_name))
         else:
-            print("Cannot remove video from {0}: Playlist does not exist".format(playlist_name))
+            self._output.write_error("Cannot remove video from {0}: Playlist does not exist".format(playlist_name))
 
+    @_command
     def clear_playlist(self, playlist_name):
         """Removes all videos from a playlist with a given name.
 
@@ -236,10 +315,12 @@ class VideoPlayer:
         playlist = self.find_playlist(playlist_name)
         if playlist:
             playlist.clear()
-            print("Successfully removed all videos from {0}".format(playlist_name))
+            self._record("clear", playlist)
+            self._output.write_line("Successfully removed all videos from {0}".format(playlist_name))
         else:
-            print("Cannot clear playlist {0}: Playlist does not exist".format(playlist_name))
+            self._output.write_error("Cannot clear playlist {0}: Playlist does not exist".format(playlist_name))
 
+    @_command
     def delete_playlist(self, playlist_name):
         """Deletes a playlist with a given name.
 
@@ -248,60 +329,182 @@ class VideoPlayer:
         """
         playlist = self.find_playlist(playlist_name)
         if playlist:
-            self.playlists.remove(playlist)
-            print("Deleted playlist: {0}".format(playlist_name))
+            del self._playlists[playlist.name_nocase]
+            index = bisect.bisect_left(self._playlist_order, playlist.name_nocase)
+            del self._playlist_order[index]
+            self._record("delete", playlist)
+            self._output.write_line("Deleted playlist: {0}".format(playlist_name))
         else:
-            print("Cannot delete playlist {0}: Playlist does not exist".format(playlist_name))
+            self._output.write_error("Cannot delete playlist {0}: Playlist does not exist".format(playlist_name))
+
+    @_command
+    def search_results(self, search_term, results, offset=0, more=False):
+        """Displays search results and offers to play one of the results.
+        Answering NEXT or PREV shows the next or previous page and asks again.
 
-    def search_results(self, search_term, results):
-        """Displays search results and offers to play one of the results
-        
         Args:
             search_term: The search term that was used to generate the search
-            results: A list of video objects to be displayed"""
-        results = list(filter(lambda v: not v.flagged, results))
-        print("Here are the results for {0}:".format(search_term))
-        x = 0
-        while x < len(results):
-            print("\t{0}) {1}".format(x+1, self.prettify_video(results[x])))
-            x += 1
-        print("Would you like to play any of the above? If yes, specify the number of the video.\nIf your answer is not a valid number, we will assume it's a no.")
-        raw_selection = input()
+            results: A list of video objects to be displayed
+            offset: How many results came before these, on earlier pages
+            more: True if there are results after these, on later pages"""
+        while True:
+            results = list(filter(lambda v: not v.flagged, results))
+            self._output.write_line("Here are the results for {0}:".format(search_term))
+            x = 0
+            while x < len(results):
+                self._output.write_video("\t{0}) {1}".format(offset+x+1, self.prettify_video(results[x])), results[x], offset+x+1)
+                x += 1
+            if offset or more:
+                self._output.write_line("Showing results {0}-{1}. Enter NEXT or PREV to see other results.".format(offset+1, offset+len(results)))
+            self._output.write_line("Would you like to play any of the above? If yes, specify the number of the video.\nIf your answer is not a valid number, we will assume it's a no.")
+            self._output.flush()
+            if self._defer_prompts:
+                self._pending_results = (results, offset)
+                return
+            raw_selection = input() if self._input is None else self._input()
+            answer = raw_selection.strip().upper()
+            if answer not in ("NEXT", "PREV"):
+                self._select_result(results, offset, raw_selection)
+                return
+            page = self._turn_page(answer == "NEXT")
+            if page is None:
+                return
+            search_term, results, offset, more = page
+
+    @property
+    def awaiting_answer(self):
+        """Returns true if a deferred search prompt is waiting for an answer."""
+        return self._pending_results is not None
+
+    @_command
+    def answer_search_prompt(self, raw_selection):
+        """Answers a search prompt left waiting by a player created with
+        defer_prompts.
+
+        Args:
+            raw_selection: The user's answer to the prompt."""
+        pending = self._pending_results
+        self._pending_results = None
+        if pending is None:
+            return
+        answer = raw_selection.strip().upper()
+        if answer == "NEXT":
+            self.next_results()
+        elif answer == "PREV":
+            self.previous_results()
+        else:
+            self._select_result(*pending, raw_selection)
+
+    def _select_result(self, results, offset, raw_selection):
         selection = None
         try:
             selection = int(raw_selection)
         except ValueError:
             return
-        if selection >= 1 and selection-1 < len(results):
-            self.play_me(results[selection-1])
-
+        if selection-offset >= 1 and selection-offset-1 < len(results):
+            self.play_me(results[selection-offset-1])
+
+    def _search_page(self, kind, term, offset):
+        """Returns a page of unflagged search results, and whether more
+        results follow it. Only as many results are looked up as it takes to
+        fill the page."""
+        limit = None if self._page_size is None else offset + self._page_size + 1
+        if kind == "title":
+            results = self._video_library.search_titles(
+                term, include_flagged=False, limit=limit)
+        elif kind == "ranked":
+            results = self._video_library.search_titles_ranked(
+                term, include_flagged=False, limit=limit)
+        else:
+            results = self._video_library.get_videos_with_tag(
+                term, include_flagged=False, limit=limit)
+        if self._page_size is None:
+            return results, False
+        return results[offset:offset + self._page_size], len(results) == limit
+
+    def _show_search(self, kind, term, offset=0):
+        results, more = self._search_page(kind, term, offset)
+        if results:
+            self._last_search = (kind, term, offset)
+            self.search_results(term, results, offset, more)
+        return bool(results)
+
+    def _turn_page(self, forward):
+        """Looks up the page after or before the last one shown and makes it
+        the last one shown. Returns the search term, the page, its offset and
+        whether more results follow it, or None if there is no such page."""
+        direction = "next" if forward else "previous"
+        if self._last_search is None:
+            self._output.write_error("Cannot show {0} results: No search results to page through".format(direction))
+            return None
+        kind, term, offset = self._last_search
+        if forward:
+            if self._page_size is None:
+                self._output.write_error("Cannot show next results: Already showing the last results")
+                return None
+            offset += self._page_size
+        elif not offset:
+            self._output.write_error("Cannot show previous results: Already showing the first results")
+            return None
+        else:
+            offset = max(offset - self._page_size, 0)
+        results, more = self._search_page(kind, term, offset)
+        if not results:
+            if forward:
+                self._output.write_error("Cannot show next results: Already showing the last results")
+            return None
+        self._last_search = (kind, term, offset)
+        return term, results, offset, more
+
+    @_command
+    def next_results(self):
+        """Displays the next page of the last search's results."""
+        page = self._turn_page(True)
+        if page is not None:
+            self.search_results(*page)
+
+    @_command
+    def previous_results(self):
+        """Displays the previous page of the last search's results."""
+        page = self._turn_page(False)
+        if page is not None:
+            self.search_results(*page)
+
+    @_command
     def search_videos(self, search_term):
         """Display all the videos whose titles contain the search_term.
 
         Args:
             search_term: The query to be used in search.
         """
-        term_lower = search_term.lower()
-        results = sorted([video for video in self._video_library.get_all_videos() if term_lower in video.title.lower()], key=lambda v: v.title)
-        if results:
-            self.search_results(search_term, results)
-        else:
-            print("No search results for {0}".format(search_term))
+        if not self._show_search("title", search_term):
+            self._output.write_line("No search results for {0}".format(search_term))
 
 
+    @_command
     def search_videos_tag(self, video_tag):
         """Display all videos whose tags contains the provided tag.
 
         Args:
             video_tag: The video tag to be used in search.
         """
-        tag_lower = video_tag.lower()
-        results = sorted([video for video in self._video_library.get_all_videos() if tag_lower in map(lambda t: t.lower(), video.tags)], key=lambda v: v.title)
-        if results:
-            self.search_results(video_tag, results)
-        else:
-            print("No search results for {0}".format(video_tag))
+        if not self._show_search("tag", video_tag):
+            self._output.write_line("No search results for {0}".format(video_tag))
+
+    @_command
+    def search_videos_ranked(self, *query_words):
+        """Display the videos whose titles best match the query, best first.
+
+        Args:
+            query_words: The words of the query. Words must all be in a
+                title unless separated by OR, and a word ending in * matches
+                any word starting with it.
+        """
+        query = " ".join(query_words)
+        if not self._show_search("ranked", query):
+            self._output.write_line("No search results for {0}".format(query))
 
+    @_command
     def flag_video(self, video_id, flag_reason=""):
         """Mark a video as flagged.
 
@@ -311,16 +514,24 @@ class VideoPlayer:
         """
         video = self.find_video(video_id)
         if video:
-            if not video.flagged:
-                video.flag(flag_reason)
+            try:
+                flagged = self._video_library.flag_video(video, flag_reason)
+            except ValueError as error:
+                self._output.write_error("Cannot flag video: {0}".format(error))
+                return
+            except OSError as error:
+                self._output.write_error("Cannot flag video: Flags could not be saved ({0})".format(error.strerror or error))
+                return
+            if flagged:
                 if self.playing == video:
                     self.stop_video()
-                print("Successfully flagged video: {0} (reason: {1})".format(video.title, video.flagged_reason))
+                self._output.write_line("Successfully flagged video: {0} (reason: {1})".format(video.title, video.flagged_reason))
             else:
-                print("Cannot flag video: Video is already flagged")
+                self._output.write_error("Cannot flag video: Video is already flagged")
         else:
-            print("Cannot flag video: Video does not exist")
+            self._output.write_error("Cannot flag video: Video does not exist")
 
+    @_command
     def allow_video(self, video_id):
         """Removes a flag from a video.
 
@@ -329,10 +540,14 @@ class VideoPlayer:
         """
         video = self.find_video(video_id)
         if video:
-            if video.flagged:
-                video.unflag()
-                print("Successfully removed flag from video: {0}".format(video.title))
+            try:
+                allowed = self._video_library.allow_video(video)
+            except OSError as error:
+                self._output.write_error("Cannot remove flag from video: Flags could not be saved ({0})".format(error.strerror or error))
+                return
+            if allowed:
+                self._output.write_line("Successfully removed flag from video: {0}".format(video.title))
             else:
-                print("Cannot remove flag from video: Video is not flagged")
+                self._output.write_error("Cannot remove flag from video: Video is not flagged")
         else:
-            print("Cannot remove flag from video: Video does not exist")
+            self._output.write_error("Cannot remove flag from video: Video does not exist")
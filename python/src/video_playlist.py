@@ -5,7 +5,10 @@ class Playlist:
     """A class used to represent a Playlist."""
     def __init__(self, playlist_name):
         self._name = playlist_name
-        self._videos = []
+        self._name_nocase = playlist_name.lower()
+        # Videos keyed by video id. Dicts keep insertion order, so this gives
+        # constant time membership and removal while preserving play order.
+        self._videos = {}
 
     @property
     def name(self) -> str:
@@ -13,11 +16,14 @@ class Playlist:
 
     @property
     def name_nocase(self) -> str:
-        return self._name.lower()
+        return self._name_nocase
 
     @property
     def videos(self):
-        return self._videos
+        return self._videos.values()
+
+    def __contains__(self, video):
+        return video.video_id in self._videos
 
     def add_video(self, video):
         """Adds a video to the playlist. Returns true if successful, false if video already in playlist
@@ -25,10 +31,10 @@ class Playlist:
         Args:
             video: The video object to be added
         """
-        if video in self.videos:
+        if video.video_id in self._videos:
             return False
         else:
-            self._videos.append(video)
+            self._videos[video.video_id] = video
             return True
 
     def remove_video(self, video):
@@ -37,12 +43,33 @@ class Playlist:
         Args:
             video: The video object to be removed
         """
-        if video in self.videos:
-            self._videos.remove(video)
-            return True
-        else:
-            return False
+        return self._videos.pop(video.video_id, None) is not None
+
+    def add_videos(self, videos):
+        """Adds several videos to the playlist, skipping any already in it. Returns the videos that were added
+        
+        Args:
+            videos: An iterable of video objects to be added
+        """
+        added = []
+        for video in videos:
+            if video.video_id not in self._videos:
+                self._videos[video.video_id] = video
+                added.append(video)
+        return added
+
+    def remove_videos(self, videos):
+        """Removes several videos from the playlist, skipping any not in it. Returns the videos that were removed
+        
+        Args:
+            videos: An iterable of video objects to be removed
+        """
+        removed = []
+        for video in videos:
+            if self._videos.pop(video.video_id, None) is not None:
+                removed.append(video)
+        return removed
 
     def clear(self):
         """Removes all videos from a playlist"""
-        self._videos = []
\ No newline at end of file
+        self._videos = {}
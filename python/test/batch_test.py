@@ -0,0 +1,37 @@
+from src.batch import run_batch
+from src.output_sink import CollectingSink
+
+
+def test_batch_reads_search_answers_from_stream():
+    sink = CollectingSink()
+    commands, seconds = run_batch([
+        "SEARCH_VIDEOS_WITH_TAG #dog\n",
+        "1\n",
+        "PLAY\n",
+        "SHOW_PLAYING\n",
+        "EXIT\n",
+        "STOP\n",
+    ], output=sink)
+
+    assert commands == 3
+    assert seconds >= 0
+    lines = [line for flushed in sink.take() for line in flushed]
+    assert lines[-3:] == [
+        "Playing video: Funny Dogs",
+        "Please enter PLAY command followed by video_id.",
+        "Currently playing: Funny Dogs (funny_dogs_video_id) [#dog #animal]",
+    ]
+
+
+def test_batch_answers_search_prompts_with_policy():
+    sink = CollectingSink()
+    commands, _ = run_batch(
+        ["SEARCH_VIDEOS cat", "SHOW_PLAYING"], output=sink, search_answer="2")
+
+    assert commands == 2
+    lines = [line for flushed in sink.take() for line in flushed]
+    assert lines[-2:] == [
+        "Playing video: Another Cat Video",
+        "Currently playing: Another Cat Video (another_cat_video_id) "
+        "[#cat #animal]",
+    ]
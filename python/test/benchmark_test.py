@@ -0,0 +1,80 @@
+from unittest import mock
+
+from src.benchmark import (
+    find_regressions, open_backend, prepare_backend, run_benchmark,
+    run_benchmarks)
+from src.columnar_library import ColumnarVideoLibrary
+from src.synthetic_catalog import SyntheticCatalog
+from src.video_library import VideoLibrary
+
+
+def test_synthetic_catalog_is_reproducible(tmp_path):
+    SyntheticCatalog(500, seed=3).write(tmp_path / "a.txt")
+    SyntheticCatalog(500, seed=3).write(tmp_path / "b.txt")
+    assert (tmp_path / "a.txt").read_text() == (tmp_path / "b.txt").read_text()
+
+    library = VideoLibrary(tmp_path / "a.txt")
+    assert len(library) == 500
+    assert library.get_video(SyntheticCatalog.video_id(499))
+    assert library.search_titles(SyntheticCatalog(500, seed=3).words[0])
+
+
+def test_benchmark_times_every_command(tmp_path):
+    report = run_benchmarks([300], "columnar", iterations=3, directory=tmp_path)
+
+    result, = report["results"]
+    assert result["videos"] == 300
+    assert {
+        "SHOW_ALL_VIDEOS", "PLAY_RANDOM", "SEARCH_VIDEOS common",
+        "SEARCH_VIDEOS_WITH_TAG common", "ADD_TO_PLAYLIST", "FLAG_VIDEO",
+        "ALLOW_VIDEO",
+    } <= set(result["commands"])
+    assert result["commands"]["ADD_TO_PLAYLIST"]["runs"] == 6
+    assert find_regressions(report, report) == []
+
+    slower = {"results": [dict(result, commands={
+        "PLAY": dict(result["commands"]["PLAY"], p50=0)})]}
+    assert find_regressions(report, slower)[0][:2] == (300, "PLAY")
+
+
+def test_compiled_backend_loads_without_compiling(tmp_path):
+    catalog_path = tmp_path / "synthetic.txt"
+    SyntheticCatalog(300).write(catalog_path)
+    compiled_path = prepare_backend("compiled", catalog_path)
+
+    with mock.patch.object(ColumnarVideoLibrary, "compile") as compile:
+        library = open_backend("compiled", compiled_path)
+    assert not compile.called
+    assert len(library) == 300
+
+
+def test_only_repeat_benchmarks_hit_the_search_cache(tmp_path):
+    catalog_path = tmp_path / "synthetic.txt"
+    SyntheticCatalog(300).write(catalog_path)
+    libraries = []
+
+    def record_library(*args, **kwargs):
+        libraries.append(open_backend(*args, **kwargs))
+        return libraries[-1]
+
+    with mock.patch("src.benchmark.open_backend", side_effect=record_library):
+        result = run_benchmark(SyntheticCatalog(300), catalog_path, "objects",
+                               iterations=3)
+
+    uncached, cached = libraries
+    assert uncached.search_cache.hits == 0
+    assert cached.search_cache.hits == 4
+    assert result["commands"]["SEARCH_VIDEOS repeat"]["runs"] == 3
+
+
+
+def test_kept_catalogs_are_not_reused_across_seeds(tmp_path):
+    run_benchmarks([200], "objects", iterations=1, seed=0, directory=tmp_path)
+    run_benchmarks([200], "objects", iterations=1, seed=1, directory=tmp_path)
+
+    catalogs = sorted(path.name for path in tmp_path.glob("*.txt"))
+    assert len(catalogs) == 2
+    for seed, name in enumerate(catalogs):
+        catalog = SyntheticCatalog(200, seed)
+        assert (tmp_path / name).read_text().splitlines()[0].split(" | ")[0] == (
+            next(catalog.records())[0])
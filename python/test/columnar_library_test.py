@@ -0,0 +1,180 @@
+import random
+import tracemalloc
+
+import pytest
+
+from src.columnar_library import (
+    _HEADER, _SECTION, ColumnarVideoLibrary, compile_catalog)
+from src.video_library import DEFAULT_CATALOG_PATH
+from src.video_player import VideoPlayer
+
+
+def test_library_has_all_videos():
+    library = ColumnarVideoLibrary()
+    assert len(library) == 5
+    assert len(library.get_all_videos()) == 5
+
+
+def test_parses_video_correctly():
+    library = ColumnarVideoLibrary()
+    video = library.get_video("amazing_cats_video_id")
+
+    assert video is not None
+    assert video.title == "Amazing Cats"
+    assert video.video_id == "amazing_cats_video_id"
+    assert video.tags == ("#cat", "#animal")
+    assert library.get_video("nothing_video_id").tags == ()
+    assert library.get_video("does_not_exist") is None
+
+
+def test_searches_columns():
+    library = ColumnarVideoLibrary()
+
+    assert [video.title for video in library.search_titles("CAT")] == [
+        "Amazing Cats", "Another Cat Video"]
+    assert len(library.search_titles("")) == 5
+    assert [video.title for video in library.get_videos_with_tag("#Animal")] == [
+        "Amazing Cats", "Another Cat Video", "Funny Dogs"]
+
+
+def test_views_share_flag_state():
+    library = ColumnarVideoLibrary(records=[
+        ("Funny Dogs", "funny_dogs_video_id", ["#dog"]),
+        ("Funny Dogs", "funny_dogs_video_id", ["#dog", "#animal"]),
+        ("Amazing Cats", "amazing_cats_video_id", ["#cat"]),
+    ])
+    video = library.get_video("funny_dogs_video_id")
+    video.flag("")
+
+    assert len(library) == 2
+    assert video.tags == ("#dog", "#animal")
+    assert video == library.get_video("funny_dogs_video_id")
+    assert library.get_video("funny_dogs_video_id").flagged_reason == "Not supplied"
+    assert not library.get_video("amazing_cats_video_id").flagged
+
+    video.unflag()
+    assert not library.get_video("funny_dogs_video_id").flagged
+
+
+def test_player_runs_on_columnar_library(capfd):
+    player = VideoPlayer(ColumnarVideoLibrary())
+    player.show_all_videos()
+    player.play_video("funny_dogs_video_id")
+    player.flag_video("funny_dogs_video_id", "dont_like_dogs")
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 9
+    assert "Amazing Cats (amazing_cats_video_id) [#cat #animal]" in lines[1]
+    assert "Playing video: Funny Dogs" in lines[6]
+    assert "Stopping video: Funny Dogs" in lines[7]
+    assert "Successfully flagged video: Funny Dogs (reason: dont_like_dogs)" in lines[8]
+
+
+def test_compiled_catalog_round_trip(tmp_path):
+    compiled_path = tmp_path / "videos.ytc"
+    compile_catalog(DEFAULT_CATALOG_PATH, compiled_path)
+    library = ColumnarVideoLibrary.open_compiled(compiled_path)
+
+    assert len(library) == 5
+    video = library.get_video("amazing_cats_video_id")
+    assert video.title == "Amazing Cats"
+    assert video.tags == ("#cat", "#animal")
+    assert library.get_video("does_not_exist") is None
+    assert [video.title for video in library.search_titles("cat")] == [
+        "Amazing Cats", "Another Cat Video"]
+    assert [video.title for video in library.get_videos_with_tag("#ANIMAL")] == [
+        "Amazing Cats", "Another Cat Video", "Funny Dogs"]
+
+    video.flag("dont_like_cats")
+    assert library.get_video("amazing_cats_video_id").flagged
+
+
+def test_open_compiled_rejects_other_files(tmp_path):
+    with pytest.raises(ValueError):
+        ColumnarVideoLibrary.open_compiled(DEFAULT_CATALOG_PATH)
+
+
+def test_compiled_sections_are_aligned(tmp_path):
+    compiled_path = tmp_path / "videos.ytc"
+    compile_catalog(DEFAULT_CATALOG_PATH, compiled_path)
+    data = compiled_path.read_bytes()
+    section_count = _HEADER.unpack_from(data)[-1]
+
+    for i in range(section_count):
+        offset, _ = _SECTION.unpack_from(data, _HEADER.size + i * _SECTION.size)
+        assert offset % 8 == 0
+
+
+def test_open_compiled_rejects_truncated_files(tmp_path):
+    compiled_path = tmp_path / "videos.ytc"
+    compile_catalog(DEFAULT_CATALOG_PATH, compiled_path)
+    data = compiled_path.read_bytes()
+    compiled_path.write_bytes(data[:len(data) - 16])
+
+    with pytest.raises(ValueError):
+        ColumnarVideoLibrary.open_compiled(compiled_path)
+
+
+def test_random_video_skips_flagged_videos():
+    library = ColumnarVideoLibrary()
+    for video in library.get_all_videos():
+        if video.video_id != "nothing_video_id":
+            assert library.flag_video(video, "")
+    rng = random.Random(0)
+
+    assert {library.get_random_video(rng).video_id for _ in range(20)} == {
+        "nothing_video_id"}
+    assert library.flag_video(library.get_video("nothing_video_id"), "")
+    assert library.get_random_video(rng) is None
+
+
+def test_shared_flag_reasons_reclaim_space_on_allow():
+    library = ColumnarVideoLibrary()
+    library.share_flags(reason_size=32)
+    video = library.get_video("amazing_cats_video_id")
+    for i in range(100):
+        assert library.flag_video(video, "reason number {0}".format(i))
+        assert video.flagged_reason == "reason number {0}".format(i)
+        assert library.allow_video(video)
+
+    assert video.flagged_reason == ""
+
+
+def test_shared_flag_reasons_reject_reasons_too_long(capfd):
+    library = ColumnarVideoLibrary()
+    library.share_flags(reason_size=32)
+    player = VideoPlayer(library)
+    player.flag_video("amazing_cats_video_id", "x" * 31)
+    player.flag_video("funny_dogs_video_id", "x" * 30)
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+
+    assert lines == [
+        "Cannot flag video: Reason is too long",
+        "Successfully flagged video: Funny Dogs (reason: {0})".format("x" * 30)]
+    assert not library.get_video("amazing_cats_video_id").flagged
+
+
+def test_bytes_per_row():
+    count = 10000
+    records = [("Video {0}".format(i), "video_{0}_id".format(i), ["#animal", "#cat"])
+               for i in range(count)]
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        library = ColumnarVideoLibrary(records=records)
+        bytes_per_row = (tracemalloc.get_traced_memory()[0] - before) / count
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        titles = sum(len(video.title) for video in library.get_videos_by_title())
+        listing_bytes = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    assert titles
+    # Unlike the 180 bytes a Video takes before its title and id strings,
+    # this includes copies of the titles and ids.
+    assert bytes_per_row < 120
+    # Listing creates one view at a time rather than one per row.
+    assert listing_bytes < 4096
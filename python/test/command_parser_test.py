@@ -0,0 +1,49 @@
+import pytest
+
+from src.command_parser import CommandException, CommandParser
+from src.output_sink import CollectingSink
+from src.video_player import VideoPlayer
+
+
+def _parser():
+    sink = CollectingSink()
+    return CommandParser(VideoPlayer(output=sink)), sink
+
+
+def test_dispatches_case_insensitive_verbs():
+    parser, sink = _parser()
+    parser.execute_command(["play", "funny_dogs_video_id"])
+    parser.execute_command(["Flag_Video", "funny_dogs_video_id", "dont_like_dogs"])
+    parser.execute_command(["ALLOW_VIDEO", "funny_dogs_video_id"])
+
+    assert sink.take() == [
+        ["Playing video: Funny Dogs"],
+        ["Stopping video: Funny Dogs",
+         "Successfully flagged video: Funny Dogs (reason: dont_like_dogs)"],
+        ["Successfully removed flag from video: Funny Dogs"],
+    ]
+
+
+def test_rejects_wrong_number_of_arguments():
+    parser, sink = _parser()
+    with pytest.raises(CommandException, match="PLAY command followed by"):
+        parser.execute_command(["PLAY"])
+    with pytest.raises(CommandException, match="optional flag reason"):
+        parser.execute_command(["FLAG_VIDEO", "a", "b", "c"])
+    assert sink.take() == []
+
+
+def test_register_command():
+    parser, sink = _parser()
+    calls = []
+    parser.register_command(
+        "echo", lambda word: calls.append(word), (1,),
+        "Please enter ECHO command followed by a word.",
+        "ECHO <word> - Echoes a word.")
+    parser.execute_command(["ECHO", "hello"])
+    parser.execute_command(["HELP"])
+
+    assert calls == ["hello"]
+    help_lines = sink.take()[0][0].splitlines()
+    assert help_lines[-1] == "    ECHO <word> - Echoes a word."
+    assert "    EXIT - Terminates the program execution." in help_lines
@@ -0,0 +1,51 @@
+import pytest
+
+from src.command_parser import CommandException, CommandParser
+from src.command_stats import CommandStats
+from src.output_sink import CollectingSink
+from src.video_player import VideoPlayer
+
+
+def test_percentiles_are_within_histogram_precision():
+    stats = CommandStats()
+    for i in range(1, 1001):
+        stats.record("PLAY", i / 1e6)
+    snapshot = stats.snapshot()["PLAY"]
+
+    assert snapshot["calls"] == 1000
+    assert snapshot["mean"] == pytest.approx(500.5e-6)
+    assert 500e-6 <= snapshot["p50"] <= 500e-6 * 1.07
+    assert 990e-6 <= snapshot["p99"] <= 990e-6 * 1.07
+
+
+def test_parser_records_calls_and_errors():
+    sink = CollectingSink()
+    stats = CommandStats()
+    parser = CommandParser(VideoPlayer(output=sink), stats)
+    parser.execute_command(["play", "funny_dogs_video_id"])
+    parser.execute_command(["PLAY", "nothing_video_id"])
+    with pytest.raises(CommandException):
+        parser.execute_command(["PLAY"])
+    parser.execute_command(["NOT_A_COMMAND"])
+    with pytest.raises(CommandException):
+        parser.execute_command([])
+
+    snapshot = stats.snapshot()
+    assert list(snapshot) == ["INVALID", "PLAY"]
+    assert (snapshot["PLAY"]["calls"], snapshot["PLAY"]["errors"]) == (3, 1)
+    assert (snapshot["INVALID"]["calls"], snapshot["INVALID"]["errors"]) == (2, 1)
+
+    sink.take()
+    parser.execute_command(["STATS"])
+    lines = sink.take()[0]
+    assert lines[0] == "Command statistics:"
+    assert lines[2].startswith("    PLAY: 3 calls, 1 errors, p50 ")
+
+
+def test_stats_disabled():
+    sink = CollectingSink()
+    parser = CommandParser(VideoPlayer(output=sink))
+    parser.execute_command(["STATS"])
+
+    assert parser.stats is None
+    assert sink.take() == [["Command statistics are not enabled"]]
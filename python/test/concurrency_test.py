@@ -0,0 +1,79 @@
+import random
+import sys
+import threading
+
+import pytest
+
+from src.columnar_library import ColumnarVideoLibrary
+from src.command_parser import CommandParser
+from src.output_sink import CollectingSink
+from src.video import Video
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+_VIDEOS = 50
+_THREADS = 8
+_COMMANDS = 2000
+
+
+def _video_library():
+    library = VideoLibrary()
+    for i in range(_VIDEOS):
+        library.add_video(Video("Video {0}".format(i), "video_{0}_id".format(i), ["#load"]))
+    return library
+
+
+def _columnar_library():
+    return ColumnarVideoLibrary(records=[
+        ("Video {0}".format(i), "video_{0}_id".format(i), ["#load"])
+        for i in range(_VIDEOS)])
+
+
+def _hammer(parser, seed):
+    rng = random.Random(seed)
+    for _ in range(_COMMANDS):
+        video_id = "video_{0}_id".format(rng.randrange(_VIDEOS))
+        verb = rng.choice(["FLAG_VIDEO", "ALLOW_VIDEO", "PLAY", "PLAY_RANDOM"])
+        if verb == "PLAY_RANDOM":
+            parser.execute_command([verb])
+        else:
+            parser.execute_command([verb, video_id])
+
+
+@pytest.fixture
+def fast_thread_switching():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize("make_library", [_video_library, _columnar_library])
+def test_concurrent_flagging_keeps_invariants(make_library, fast_thread_switching):
+    library = make_library()
+    sinks = [CollectingSink() for _ in range(_THREADS)]
+    parsers = [CommandParser(VideoPlayer(library, rng=random.Random(i), output=sink))
+               for i, sink in enumerate(sinks)]
+    threads = [threading.Thread(target=_hammer, args=(parser, i))
+               for i, parser in enumerate(parsers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lines = [line for sink in sinks for flushed in sink.take() for line in flushed]
+    flags = sum(line.startswith("Successfully flagged video") for line in lines)
+    allows = sum(line.startswith("Successfully removed flag") for line in lines)
+    flagged = [video for video in library.get_all_videos() if video.flagged]
+
+    # Every flag change succeeded exactly once, so the successes balance out
+    # to the videos left flagged.
+    assert flags - allows == len(flagged)
+    assert all(video.flagged_reason == "Not supplied" for video in flagged)
+    # A random pick never lands on a flagged video.
+    picks = {library.get_random_video(random.Random(i)) for i in range(200)}
+    assert not any(video.flagged for video in picks if video is not None)
+    if isinstance(library, VideoLibrary):
+        assert {video.video_id for video in library._unflagged} == {
+            video.video_id for video in library.get_all_videos()
+            if not video.flagged}
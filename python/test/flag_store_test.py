@@ -0,0 +1,113 @@
+from unittest import mock
+
+from src.columnar_library import ColumnarVideoLibrary
+from src.flag_store import FlagStore
+from src.output_sink import CollectingSink
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+import errno
+import gc
+import pytest
+import weakref
+
+
+@pytest.mark.parametrize("make_library", [
+    VideoLibrary,
+    lambda: VideoLibrary(lazy=True),
+    ColumnarVideoLibrary,
+])
+def test_flags_survive_restart(tmp_path, make_library):
+    path = tmp_path / "flags"
+    library = make_library()
+    store = FlagStore(path)
+    library.persist_flags(store)
+    library.flag_video(library.get_video("amazing_cats_video_id"), "dont_like_cats")
+    library.flag_video(library.get_video("funny_dogs_video_id"), "")
+    library.flag_video(library.get_video("nothing_video_id"), "boring")
+    library.allow_video(library.get_video("nothing_video_id"))
+    store.close()
+
+    library = make_library()
+    store = FlagStore(path)
+    library.persist_flags(store)
+    assert {video_id: reason for video_id, (reason, _) in store.flags.items()} == {
+        "amazing_cats_video_id": "dont_like_cats",
+        "funny_dogs_video_id": "Not supplied",
+    }
+    assert library.get_video("amazing_cats_video_id").flagged_reason == "dont_like_cats"
+    assert library.get_video("funny_dogs_video_id").flagged
+    assert not library.get_video("nothing_video_id").flagged
+    for _ in range(20):
+        assert library.get_random_video().video_id not in store.flags
+    store.close()
+
+
+def test_burst_of_flags_is_group_committed(tmp_path):
+    store = FlagStore(tmp_path / "flags", commit_interval=1)
+    for i in range(200):
+        store.record_flag("video_{0}".format(i), "spam")
+    store.sync()
+
+    assert store.commits < 200
+    store.close()
+    assert len(FlagStore(tmp_path / "flags").flags) == 200
+
+
+def test_torn_entry_is_dropped(tmp_path):
+    path = tmp_path / "flags"
+    store = FlagStore(path)
+    store.record_flag("a", "spam")
+    store.close()
+    with open(path, "a") as log_file:
+        log_file.write('["F", 1.0, "b"')
+
+    store = FlagStore(path)
+    store.record_flag("c", "spam")
+    store.close()
+    assert set(FlagStore(path).flags) == {"a", "c"}
+
+
+def test_closed_store_can_be_freed(tmp_path):
+    store = FlagStore(tmp_path / "flags")
+    store.record_flag("amazing_cats_video_id", "dont_like_cats")
+    store.close()
+    store_ref = weakref.ref(store)
+    del store
+    gc.collect()
+
+    assert store_ref() is None
+
+
+def test_failed_log_leaves_flags_unchanged(tmp_path):
+    library = VideoLibrary()
+    store = FlagStore(tmp_path / "flags")
+    library.persist_flags(store)
+    sink = CollectingSink()
+    player = VideoPlayer(library, output=sink)
+    with mock.patch("src.flag_store.os.write",
+                    side_effect=OSError(errno.ENOSPC, "No space left on device")):
+        store.record_flag("nothing_video_id", "boring")
+        with pytest.raises(OSError):
+            store.sync()
+    player.flag_video("amazing_cats_video_id", "dont_like_cats")
+
+    assert sink.take() == [[
+        "Cannot flag video: Flags could not be saved (No space left on device)"]]
+    assert not library.get_video("amazing_cats_video_id").flagged
+    assert "amazing_cats_video_id" not in store.flags
+    store.close()
+
+
+def test_log_is_compacted_while_running(tmp_path):
+    path = tmp_path / "flags"
+    store = FlagStore(path, commit_interval=0)
+    for i in range(3000):
+        store.record_flag("video_{0}".format(i % 10), "spam")
+        store.record_allow("video_{0}".format(i % 10))
+        store.sync()
+    store.record_flag("kept", "spam")
+    store.close()
+
+    with open(path, encoding="utf-8") as log_file:
+        assert len(log_file.readlines()) < 2500
+    assert set(FlagStore(path).flags) == {"kept"}
@@ -0,0 +1,76 @@
+import io
+
+from src.command_parser import CommandParser
+from src.output_sink import CollectingSink, OutputSink, StructuredSink
+from src.video_player import VideoPlayer
+
+
+class _CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def test_output_is_written_once_per_command():
+    stream = _CountingStream()
+    player = VideoPlayer(output=OutputSink(stream))
+    player.show_all_videos()
+
+    assert stream.writes == 1
+    assert len(stream.getvalue().splitlines()) == 6
+
+
+def test_collecting_sink_returns_lines_per_command():
+    sink = CollectingSink()
+    player = VideoPlayer(output=sink)
+    player.play_video("amazing_cats_video_id")
+    player.flag_video("amazing_cats_video_id")
+    player.show_playing()
+
+    assert sink.take() == [
+        ["Playing video: Amazing Cats"],
+        ["Stopping video: Amazing Cats",
+         "Successfully flagged video: Amazing Cats (reason: Not supplied)"],
+        ["No video is currently playing"],
+    ]
+    assert sink.take() == []
+
+
+def test_command_parser_writes_to_player_sink():
+    sink = CollectingSink()
+    parser = CommandParser(VideoPlayer(output=sink))
+    parser.execute_command(["NOT_A_COMMAND"])
+    parser.execute_command(["number_of_videos"])
+
+    assert sink.take() == [
+        ["Please enter a valid command, type HELP for a list of available "
+         "commands."],
+        ["5 videos in the library"],
+    ]
+
+
+def test_structured_sink_returns_records_per_command():
+    sink = StructuredSink()
+    parser = CommandParser(VideoPlayer(output=sink, input_fn=lambda: "no"))
+    parser.execute_command(["SEARCH_VIDEOS_WITH_TAG", "#dog"])
+    parser.execute_command(["PLAY", "does_not_exist"])
+
+    search, play = sink.take()
+    assert search["status"] == "ok"
+    assert search["videos"] == [{
+        "number": 1,
+        "video_id": "funny_dogs_video_id",
+        "title": "Funny Dogs",
+        "tags": ["#dog", "#animal"],
+        "flagged_reason": None,
+    }]
+    assert search["lines"][0] == "Here are the results for #dog:"
+    assert play == {
+        "status": "error",
+        "videos": [],
+        "lines": ["Cannot play video: Video does not exist"],
+    }
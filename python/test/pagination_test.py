@@ -0,0 +1,113 @@
+import argparse
+
+import pytest
+
+from src.batch import run_batch
+from src.command_parser import CommandParser
+from src.output_sink import CollectingSink
+from src.run import add_page_size_argument
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+_PROMPT = ("Would you like to play any of the above? If yes, specify the "
+           "number of the video.\nIf your answer is not a valid number, we "
+           "will assume it's a no.")
+
+
+def _player(answers=None, **kwargs):
+    sink = CollectingSink()
+    input_fn = None if answers is None else iter(answers).__next__
+    player = VideoPlayer(output=sink, input_fn=input_fn, page_size=2, **kwargs)
+    return CommandParser(player), player, sink
+
+
+def _lines(sink):
+    return [line for flushed in sink.take() for line in flushed]
+
+
+def test_pages_through_results():
+    parser, _, sink = _player(["no", "no", "no", "no"])
+    parser.execute_command(["SEARCH_VIDEOS_WITH_TAG", "#animal"])
+    parser.execute_command(["NEXT"])
+    parser.execute_command(["NEXT"])
+    parser.execute_command(["PREV"])
+
+    assert _lines(sink) == [
+        "Here are the results for #animal:",
+        "\t1) Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+        "\t2) Another Cat Video (another_cat_video_id) [#cat #animal]",
+        "Showing results 1-2. Enter NEXT or PREV to see other results.",
+        _PROMPT,
+        "Here are the results for #animal:",
+        "\t3) Funny Dogs (funny_dogs_video_id) [#dog #animal]",
+        "Showing results 3-3. Enter NEXT or PREV to see other results.",
+        _PROMPT,
+        "Cannot show next results: Already showing the last results",
+        "Here are the results for #animal:",
+        "\t1) Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+        "\t2) Another Cat Video (another_cat_video_id) [#cat #animal]",
+        "Showing results 1-2. Enter NEXT or PREV to see other results.",
+        _PROMPT,
+    ]
+
+
+def test_prompt_accepts_next_and_numbers_from_later_pages():
+    parser, player, sink = _player(["next", "3"])
+    parser.execute_command(["SEARCH_VIDEOS", "a"])
+
+    assert player.playing.video_id == "life_at_google_video_id"
+    assert _lines(sink)[-1] == "Playing video: Life at Google"
+
+
+def test_deferred_prompt_pages():
+    parser, player, sink = _player(defer_prompts=True)
+    parser.execute_command(["SEARCH_VIDEOS_WITH_TAG", "#ANIMAL"])
+    player.answer_search_prompt("NEXT")
+    assert player.awaiting_answer
+    player.answer_search_prompt("1")
+    assert player.playing is None
+    assert not player.awaiting_answer
+    parser.execute_command(["PREV"])
+    player.answer_search_prompt("1")
+
+    assert player.playing.video_id == "amazing_cats_video_id"
+
+
+def test_paging_without_a_search():
+    parser, _, sink = _player()
+    parser.execute_command(["PREV"])
+    assert _lines(sink) == [
+        "Cannot show previous results: No search results to page through"]
+
+
+def test_batch_pages_results():
+    sink = CollectingSink()
+    run_batch(["SEARCH_VIDEOS_WITH_TAG #animal", "NEXT"], output=sink,
+              search_answer="no", page_size=1)
+
+    assert [line for line in _lines(sink) if line.startswith("\t")] == [
+        "\t1) Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+        "\t2) Another Cat Video (another_cat_video_id) [#cat #animal]",
+    ]
+
+
+def test_page_size_option_rejects_negative_values():
+    arg_parser = argparse.ArgumentParser()
+    add_page_size_argument(arg_parser)
+
+    assert arg_parser.parse_args(["--page-size", "0"]).page_size == 0
+    with pytest.raises(SystemExit):
+        arg_parser.parse_args(["--page-size", "-1"])
+
+
+def test_prompt_pages_without_recursing(tmp_path):
+    catalog_path = tmp_path / "clips.txt"
+    catalog_path.write_text("".join(
+        "Clip {0} | clip_{0}_id |  #clip\n".format(i) for i in range(3000)))
+    sink = CollectingSink()
+    run_batch(["SEARCH_VIDEOS clip"] + ["NEXT"] * 1200 + ["no"],
+              VideoLibrary(catalog_path), output=sink, page_size=2)
+
+    lines = _lines(sink)
+    assert lines.count(_PROMPT) == 1201
+    assert "Showing results 2401-2402. Enter NEXT or PREV to see other results." in lines
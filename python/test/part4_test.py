@@ -269,3 +269,19 @@ def test_allow_video_show_playlist(capfd):
     assert "Successfully removed flag from video: Amazing Cats" in lines[5]
     assert "Showing playlist: my_playlist" in lines[6]
     assert "Amazing Cats (amazing_cats_video_id) [#cat #animal]" in lines[7]
+
+
+def test_show_all_videos_follows_flag_changes(capfd):
+    player = VideoPlayer()
+    player.show_all_videos()
+    player.flag_video("funny_dogs_video_id", "dont_like_dogs")
+    player.show_all_videos()
+    player.allow_video("funny_dogs_video_id")
+    player.show_all_videos()
+    out, err = capfd.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 20
+    assert lines[3] == "\t Funny Dogs (funny_dogs_video_id) [#dog #animal]"
+    assert lines[10] == ("\t Funny Dogs (funny_dogs_video_id) [#dog #animal] "
+                         "- FLAGGED (reason: dont_like_dogs)")
+    assert lines[17] == "\t Funny Dogs (funny_dogs_video_id) [#dog #animal]"
@@ -0,0 +1,70 @@
+from src.output_sink import CollectingSink
+from src.playlist_store import PlaylistStore
+from src.video_player import VideoPlayer
+
+
+def _player(directory, compact_every=1000):
+    store = PlaylistStore(directory, compact_every=compact_every)
+    return VideoPlayer(output=CollectingSink(), playlist_store=store), store
+
+
+def test_playlists_survive_restart(tmp_path):
+    player, store = _player(tmp_path)
+    player.create_playlist("My_Playlist")
+    player.add_to_playlist("my_playlist", "amazing_cats_video_id")
+    player.add_to_playlist("my_playlist", "funny_dogs_video_id")
+    player.add_to_playlist("my_playlist", "life_at_google_video_id")
+    player.remove_from_playlist("my_playlist", "funny_dogs_video_id")
+    player.create_playlist("other")
+    player.add_to_playlist("other", "nothing_video_id")
+    player.clear_playlist("other")
+    player.create_playlist("gone")
+    player.delete_playlist("gone")
+    store.close()
+
+    player, store = _player(tmp_path)
+    assert [playlist.name for playlist in player.playlists] == [
+        "My_Playlist", "other"]
+    assert [video.video_id for video in player.find_playlist("MY_PLAYLIST").videos] == [
+        "amazing_cats_video_id", "life_at_google_video_id"]
+    assert not player.find_playlist("other").videos
+    store.close()
+
+
+def test_compaction_snapshots_and_empties_journal(tmp_path):
+    player, store = _player(tmp_path, compact_every=3)
+    player.create_playlist("a")
+    player.add_to_playlist("a", "amazing_cats_video_id")
+    player.add_to_playlist("a", "funny_dogs_video_id")
+    assert (tmp_path / "playlists.snapshot.json").exists()
+    assert (tmp_path / "playlists.journal").read_text() == ""
+    player.remove_from_playlist("a", "amazing_cats_video_id")
+    store.close()
+
+    player, store = _player(tmp_path, compact_every=3)
+    assert [video.video_id for video in player.find_playlist("a").videos] == [
+        "funny_dogs_video_id"]
+    store.close()
+
+
+def test_replay_skips_changes_already_in_snapshot(tmp_path):
+    store = PlaylistStore(tmp_path)
+    store.record("create", "a")
+    store.record("add", "a", "x")
+    store.record("remove", "a", "x")
+    store.record("add", "a", "y")
+    journal = (tmp_path / "playlists.journal").read_text()
+    store.compact()
+    store.close()
+    # As if the process died after writing the snapshot but before emptying
+    # the journal, with a change torn mid-append.
+    (tmp_path / "playlists.journal").write_text(journal + '[5, "add", "a"')
+
+    store = PlaylistStore(tmp_path)
+    assert store.playlists == [("a", ["y"])]
+    store.record("add", "a", "z")
+    store.close()
+
+    store = PlaylistStore(tmp_path)
+    assert store.playlists == [("a", ["y", "z"])]
+    store.close()
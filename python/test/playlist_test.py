@@ -0,0 +1,40 @@
+from src.video import Video
+from src.video_playlist import Playlist
+
+
+def _videos(count):
+    return [Video("Video {0}".format(i), "video_{0}_id".format(i), [])
+            for i in range(count)]
+
+
+def test_playlist_keeps_insertion_order():
+    playlist = Playlist("My Playlist")
+    videos = _videos(3)
+    for video in reversed(videos):
+        assert playlist.add_video(video)
+
+    assert not playlist.add_video(videos[1])
+    assert list(playlist.videos) == list(reversed(videos))
+
+
+def test_playlist_remove_video():
+    playlist = Playlist("My Playlist")
+    videos = _videos(3)
+    playlist.add_videos(videos)
+
+    assert playlist.remove_video(videos[1])
+    assert not playlist.remove_video(videos[1])
+    assert videos[1] not in playlist
+    assert list(playlist.videos) == [videos[0], videos[2]]
+
+
+def test_playlist_bulk_add_and_remove():
+    playlist = Playlist("My Playlist")
+    videos = _videos(10000)
+
+    assert playlist.add_videos(videos) == videos
+    assert playlist.add_videos(videos[:10]) == []
+    assert len(playlist.videos) == 10000
+
+    assert playlist.remove_videos(videos[::2] + videos[:1]) == videos[::2]
+    assert list(playlist.videos) == videos[1::2]
@@ -0,0 +1,76 @@
+import asyncio
+import multiprocessing
+import socket
+
+from src.client import Session
+from src.columnar_library import ColumnarVideoLibrary
+from src.prefork import start_workers, stop_workers
+
+
+def _flag_in_child(library, video_id, reason):
+    library.flag_video(library.get_video(video_id), reason)
+
+
+def test_shared_flags_cross_processes():
+    library = ColumnarVideoLibrary()
+    library.flag_video(library.get_video("nothing_video_id"), "boring")
+    library.share_flags()
+    child = multiprocessing.get_context("fork").Process(
+        target=_flag_in_child,
+        args=(library, "funny_dogs_video_id", "dont_like_dogs"))
+    child.start()
+    child.join()
+
+    assert library.get_video("funny_dogs_video_id").flagged_reason == "dont_like_dogs"
+    assert library.get_video("nothing_video_id").flagged_reason == "boring"
+    assert not library.get_video("amazing_cats_video_id").flagged
+    library.allow_video(library.get_video("funny_dogs_video_id"))
+    assert not library.get_video("funny_dogs_video_id").flagged
+
+
+def test_workers_share_one_catalog():
+    sock = socket.create_server(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    processes = start_workers(ColumnarVideoLibrary(), sock, workers=2)
+
+    async def sessions():
+        flagging, _ = await Session.connect(port=port)
+        flagged = await flagging.execute("FLAG_VIDEO funny_dogs_video_id spam")
+        await flagging.close()
+        responses = []
+        for _ in range(4):
+            session, _ = await Session.connect(port=port)
+            responses.append(await session.execute("PLAY funny_dogs_video_id"))
+            await session.close()
+        return flagged, responses
+
+    try:
+        flagged, responses = asyncio.run(sessions())
+    finally:
+        stop_workers(processes)
+        sock.close()
+    assert flagged == "Successfully flagged video: Funny Dogs (reason: spam)\n"
+    assert set(responses) == {
+        "Cannot play video: Video is currently flagged (reason: spam)\n"}
+
+
+def test_workers_use_page_size():
+    sock = socket.create_server(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    processes = start_workers(ColumnarVideoLibrary(), sock, workers=1,
+                              page_size=1)
+
+    async def session():
+        searching, _ = await Session.connect(port=port)
+        response, _ = await searching.send("SEARCH_VIDEOS cat")
+        await searching.send("no")
+        await searching.close()
+        return response
+
+    try:
+        response = asyncio.run(session())
+    finally:
+        stop_workers(processes)
+        sock.close()
+    assert "\t1) Amazing Cats" in response
+    assert "\t2)" not in response
@@ -0,0 +1,77 @@
+from src.search_cache import SearchCache
+from src.video import Video
+from src.video_library import VideoLibrary
+
+
+def _ids(videos):
+    return [video.video_id for video in videos]
+
+
+def test_lru_eviction_and_counters():
+    cache = SearchCache(maxsize=2)
+    cache.put(("title", "a"), [1])
+    cache.put(("title", "b"), [2])
+    assert cache.get(("title", "a")) == [1]
+    cache.put(("title", "c"), [3])
+
+    assert cache.get(("title", "b")) is None
+    assert cache.get(("title", "c")) == [3]
+    assert (cache.hits, cache.misses, len(cache)) == (2, 1, 2)
+
+
+def test_repeated_searches_hit_the_cache():
+    library = VideoLibrary()
+    first = library.search_titles("CAT", include_flagged=False)
+    second = library.search_titles("cat", include_flagged=False)
+    library.get_videos_with_tag("#animal", include_flagged=False)
+    library.get_videos_with_tag("#Animal", include_flagged=False)
+
+    assert _ids(first) == _ids(second) == [
+        "amazing_cats_video_id", "another_cat_video_id"]
+    assert (library.search_cache.hits, library.search_cache.misses) == (2, 2)
+
+
+def test_flag_changes_invalidate_only_matching_searches():
+    library = VideoLibrary()
+    library.search_titles("cat", include_flagged=False)
+    library.search_titles("dog", include_flagged=False)
+    library.get_videos_with_tag("#cat", include_flagged=False)
+    library.get_videos_with_tag("#dog", include_flagged=False)
+
+    library.flag_video(library.get_video("amazing_cats_video_id"), "")
+    assert len(library.search_cache) == 2
+    assert _ids(library.search_titles("cat", include_flagged=False)) == [
+        "another_cat_video_id"]
+    assert _ids(library.get_videos_with_tag("#cat", include_flagged=False)) == [
+        "another_cat_video_id"]
+
+    library.allow_video(library.get_video("amazing_cats_video_id"))
+    assert _ids(library.search_titles("cat", include_flagged=False)) == [
+        "amazing_cats_video_id", "another_cat_video_id"]
+    assert _ids(library.search_titles("dog", include_flagged=False)) == [
+        "funny_dogs_video_id"]
+
+
+def test_catalog_changes_invalidate_searches():
+    library = VideoLibrary()
+    library.search_titles("cat", include_flagged=False)
+    library.add_video(Video("Cat Nap", "cat_nap_video_id", []))
+    assert _ids(library.search_titles("cat", include_flagged=False)) == [
+        "amazing_cats_video_id", "another_cat_video_id", "cat_nap_video_id"]
+
+    library.remove_video("cat_nap_video_id")
+    assert "cat_nap_video_id" not in _ids(
+        library.search_titles("cat", include_flagged=False))
+
+    library._load_all()
+    assert len(library.search_cache) == 0
+
+
+def test_partial_results_only_serve_shorter_requests():
+    cache = SearchCache()
+    cache.put(("title", "a"), [1, 2, 3], complete=False)
+
+    assert cache.get(("title", "a"), limit=2) == [1, 2]
+    assert cache.get(("title", "a"), limit=4) is None
+    assert cache.get(("title", "a")) is None
+    assert (cache.hits, cache.misses) == (1, 2)
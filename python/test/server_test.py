@@ -0,0 +1,71 @@
+import asyncio
+
+from src.client import Session, generate_load
+from src.server import LINE_TOO_LONG, VideoServer
+from src.video_library import VideoLibrary
+
+
+async def _with_server(body):
+    server = await VideoServer(VideoLibrary()).start(port=0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await body(port)
+
+
+def test_sessions_have_their_own_state():
+    async def body(port):
+        first, greeting = await Session.connect(port=port)
+        second, _ = await Session.connect(port=port)
+        played = await first.execute("PLAY funny_dogs_video_id")
+        created = await first.execute("CREATE_PLAYLIST mine")
+        playing = await second.execute("SHOW_PLAYING")
+        playlists = await second.execute("SHOW_ALL_PLAYLISTS")
+        farewell = await first.close()
+        await second.close()
+        return greeting, played, created, playing, playlists, farewell
+
+    greeting, played, created, playing, playlists, farewell = asyncio.run(
+        _with_server(body))
+    assert greeting.startswith("Hello and welcome to YouTube")
+    assert played == "Playing video: Funny Dogs\n"
+    assert created == "Successfully created new playlist: mine\n"
+    assert playing == "No video is currently playing\n"
+    assert playlists == "No playlists exist yet\n"
+    assert farewell.startswith("YouTube has now terminated its execution.")
+
+
+def test_search_prompt_is_answered_by_next_line():
+    async def body(port):
+        session, _ = await Session.connect(port=port)
+        response, awaiting_answer = await session.send("SEARCH_VIDEOS cat")
+        answer, still_awaiting = await session.send("2")
+        await session.close()
+        return response, awaiting_answer, answer, still_awaiting
+
+    response, awaiting_answer, answer, still_awaiting = asyncio.run(
+        _with_server(body))
+    assert response.startswith("Here are the results for cat:")
+    assert awaiting_answer
+    assert answer == "Playing video: Another Cat Video\n"
+    assert not still_awaiting
+
+
+def test_generate_load():
+    results = asyncio.run(_with_server(
+        lambda port: generate_load(port=port, sessions=5,
+                                   commands_per_session=20)))
+    assert results["commands"] == 100
+    assert results["p50_latency"] <= results["p99_latency"]
+
+
+def test_overlong_line_closes_session_with_message():
+    async def body(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"SEARCH_VIDEOS " + b"x" * 70000 + b"\n")
+        await writer.drain()
+        received = await reader.read()
+        writer.close()
+        return received.decode("utf-8")
+
+    received = asyncio.run(_with_server(body))
+    assert received.endswith(LINE_TOO_LONG + "\n")
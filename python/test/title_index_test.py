@@ -0,0 +1,83 @@
+import pytest
+
+from src.columnar_library import ColumnarVideoLibrary
+from src.command_parser import CommandException, CommandParser
+from src.output_sink import CollectingSink
+from src.title_index import TitleIndex, parse_query
+from src.video import Video
+from src.video_library import VideoLibrary
+from src.video_player import VideoPlayer
+
+
+def _ids(videos):
+    return [video.video_id for video in videos]
+
+
+def test_parse_query():
+    assert parse_query("Funny cat* OR dog's AND video") == [
+        [("funny", False), ("cat", True)],
+        [("dog", False), ("s", False), ("video", False)],
+    ]
+    assert parse_query("OR ... OR") == []
+
+
+def test_bm25_prefers_rarer_words_and_shorter_titles():
+    index = TitleIndex()
+    index.add("a", "cat video")
+    index.add("b", "cat video about a cat and another cat video")
+    index.add("c", "dog video")
+    index.add("d", "cat")
+
+    assert index.search("cat", rank=str) == ["d", "a", "b"]
+    assert index.search("video cat", rank=str) == ["a", "b"]
+    assert index.search("cat OR dog", rank=str, limit=2) == ["c", "d"]
+    index.remove("c", "dog video")
+    assert index.search("dog", rank=str) == []
+
+
+@pytest.mark.parametrize("make_library", [VideoLibrary, ColumnarVideoLibrary])
+def test_ranked_search(make_library):
+    library = make_library()
+
+    assert _ids(library.search_titles_ranked("cat")) == [
+        "another_cat_video_id"]
+    assert _ids(library.search_titles_ranked("CAT*")) == [
+        "amazing_cats_video_id", "another_cat_video_id"]
+    assert _ids(library.search_titles_ranked("video nothing")) == [
+        "nothing_video_id"]
+    assert _ids(library.search_titles_ranked("google OR dogs")) == [
+        "funny_dogs_video_id", "life_at_google_video_id"]
+    assert library.search_titles_ranked("cats dogs") == []
+
+    library.flag_video(library.get_video("amazing_cats_video_id"), "")
+    assert _ids(library.search_titles_ranked("cat*", include_flagged=False)) == [
+        "another_cat_video_id"]
+
+
+def test_ranked_index_follows_catalog_changes():
+    library = VideoLibrary()
+    library.add_video(Video("Cat Cat Cat", "cats_video_id", []))
+    assert _ids(library.search_titles_ranked("cat", limit=1)) == ["cats_video_id"]
+
+    library.remove_video("cats_video_id")
+    assert _ids(library.search_titles_ranked("cat")) == ["another_cat_video_id"]
+
+
+def test_search_videos_ranked_command():
+    sink = CollectingSink()
+    parser = CommandParser(VideoPlayer(output=sink, input_fn=lambda: "1"))
+    parser.execute_command(["SEARCH_VIDEOS_RANKED", "amazing", "OR", "another*"])
+    parser.execute_command(["SEARCH_VIDEOS_RANKED", "nope"])
+    with pytest.raises(CommandException, match="one or more search words"):
+        parser.execute_command(["SEARCH_VIDEOS_RANKED"])
+
+    assert sink.take() == [
+        ["Here are the results for amazing OR another*:",
+         "\t1) Amazing Cats (amazing_cats_video_id) [#cat #animal]",
+         "\t2) Another Cat Video (another_cat_video_id) [#cat #animal]",
+         "Would you like to play any of the above? If yes, specify the "
+         "number of the video.\nIf your answer is not a valid number, we "
+         "will assume it's a no."],
+        ["Playing video: Amazing Cats"],
+        ["No search results for nope"],
+    ]
@@ -0,0 +1,38 @@
+import tracemalloc
+
+from src.video import Video
+
+
+def test_video_has_no_instance_dict():
+    video = Video("Amazing Cats", "amazing_cats_video_id", ["#cat"])
+
+    assert not hasattr(video, "__dict__")
+
+
+def test_video_tags_are_interned():
+    first = Video("Amazing Cats", "amazing_cats_video_id", ["".join(["#c", "at"])])
+    second = Video("Another Cat Video", "another_cat_video_id", ["".join(["#c", "at"])])
+
+    assert first.tags[0] is second.tags[0]
+
+
+def test_bytes_per_video():
+    count = 10000
+    titles = ["Video {0}".format(i) for i in range(count)]
+    video_ids = ["video_{0}_id".format(i) for i in range(count)]
+    raw_tags = " #animal , #cat "
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        videos = [Video(title, video_id, [tag.strip() for tag in raw_tags.split(",")])
+                  for title, video_id in zip(titles, video_ids)]
+        bytes_per_video = (tracemalloc.get_traced_memory()[0] - before) / count
+    finally:
+        tracemalloc.stop()
+
+    assert len(videos) == count
+    # Titles and ids are shared with the caller, so this is the Video object
+    # and its tags tuple only. A dict-based Video with per-video tag strings
+    # takes roughly twice as much.
+    assert bytes_per_video < 180
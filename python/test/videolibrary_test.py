@@ -1,4 +1,7 @@
+import random
+
 from src.video_library import VideoLibrary
+from src.video import Video
 
 
 def test_library_has_all_videos():
@@ -24,3 +27,127 @@ def test_parses_video_correctly_without_tags():
     assert video.title == "Video about nothing"
     assert video.video_id == "nothing_video_id"
     assert video.tags == ()
+
+
+def test_get_videos_with_tag_sorted_by_title():
+    library = VideoLibrary()
+    videos = library.get_videos_with_tag("#ANIMAL")
+
+    assert [video.title for video in videos] == [
+        "Amazing Cats", "Another Cat Video", "Funny Dogs"]
+    assert library.get_videos_with_tag("#nothing") == []
+
+
+def test_tag_index_follows_mutations():
+    library = VideoLibrary()
+    library.add_video(Video("Bird Watching", "bird_video_id", ["#Animal"]))
+    library.remove_video("funny_dogs_video_id")
+
+    assert [video.video_id for video in library.get_videos_with_tag("#animal")] == [
+        "amazing_cats_video_id", "another_cat_video_id", "bird_video_id"]
+    assert library.get_videos_with_tag("#dog") == []
+
+
+def test_search_titles_matches_substrings():
+    library = VideoLibrary()
+
+    assert [video.title for video in library.search_titles("CAT")] == [
+        "Amazing Cats", "Another Cat Video"]
+    assert [video.title for video in library.search_titles("o")] == [
+        "Another Cat Video", "Funny Dogs", "Life at Google",
+        "Video about nothing"]
+    assert library.search_titles("cats video") == []
+
+
+def test_search_titles_follows_mutations():
+    library = VideoLibrary()
+    library.add_video(Video("Ox", "ox_video_id", []))
+    library.remove_video("amazing_cats_video_id")
+
+    assert [video.video_id for video in library.search_titles("cat")] == [
+        "another_cat_video_id"]
+    assert [video.video_id for video in library.search_titles("ox")] == [
+        "ox_video_id"]
+
+
+def test_get_videos_resolves_batches():
+    library = VideoLibrary()
+    videos = library.get_videos(
+        ["funny_dogs_video_id", "does_not_exist", "nothing_video_id"])
+
+    assert [video and video.title for video in videos] == [
+        "Funny Dogs", None, "Video about nothing"]
+
+
+def test_loads_catalog_from_path(tmp_path):
+    catalog = tmp_path / "catalog.txt"
+    catalog.write_text("Bird Watching | bird_video_id | #bird\n")
+    library = VideoLibrary(catalog)
+
+    assert len(library) == 1
+    assert library.get_video("bird_video_id").tags == ("#bird",)
+
+
+def test_lazy_library_parses_on_access():
+    library = VideoLibrary(lazy=True)
+    video = library.get_video("funny_dogs_video_id")
+
+    assert len(library) == 5
+    assert video.title == "Funny Dogs"
+    assert set(video.tags) == {"#dog", "#animal"}
+    assert library.get_video("does_not_exist") is None
+
+    video.flag("dont_like_dogs")
+    assert library.get_videos_with_tag("#dog") == [video]
+    assert library.get_all_videos()[0].flagged
+
+
+def test_title_order_follows_mutations():
+    library = VideoLibrary()
+    library.add_video(Video("Funny Dogs", "more_dogs_video_id", []))
+    library.add_video(Video("Bird Watching", "bird_video_id", []))
+    library.remove_video("life_at_google_video_id")
+
+    assert [video.video_id for video in library.get_videos_by_title()] == [
+        "amazing_cats_video_id", "another_cat_video_id", "bird_video_id",
+        "funny_dogs_video_id", "more_dogs_video_id", "nothing_video_id"]
+    assert [video.video_id for video in library.search_titles("funny")] == [
+        "funny_dogs_video_id", "more_dogs_video_id"]
+
+
+def test_title_ranks_survive_many_insertions_at_one_spot():
+    library = VideoLibrary()
+    # Each video lands right after the previous one, before "Funny Dogs",
+    # halving the room between ranks until they must be reassigned.
+    for i in range(80):
+        library.add_video(Video("Dogs", "dogs_{0}_video_id".format(i), []))
+
+    ordered = [video.video_id for video in library.get_videos_by_title()
+               if "dogs" in video.title.lower()]
+    assert [video.video_id for video in library.search_titles("dogs")] == ordered
+    assert [video.video_id for video in library.search_titles("dogs", limit=3)] == (
+        ordered[:3])
+
+
+def test_random_video_skips_flagged_videos():
+    library = VideoLibrary()
+    for video in library.get_all_videos():
+        if video.video_id != "funny_dogs_video_id":
+            assert library.flag_video(video, "")
+    dogs = library.get_video("funny_dogs_video_id")
+    rng = random.Random(0)
+
+    assert {library.get_random_video(rng) for _ in range(20)} == {dogs}
+    assert library.flag_video(dogs, "dont_like_dogs")
+    assert not library.flag_video(dogs, "dont_like_dogs")
+    assert library.get_random_video(rng) is None
+    assert library.allow_video(dogs)
+    assert library.get_random_video(rng) is dogs
+
+
+def test_random_video_is_reproducible_with_seed():
+    library = VideoLibrary()
+    first = [library.get_random_video(random.Random(42)) for _ in range(5)]
+    second = [library.get_random_video(random.Random(42)) for _ in range(5)]
+
+    assert first == second